@@ -1,23 +1,30 @@
 
 import os
+import asyncio
+import functools
 import hashlib
+import zlib
 from typing import Optional, Annotated
 
 from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.responses import (
-    HTMLResponse, JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
+    HTMLResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 )
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import httpx
+import orjson
 from httpx import HTTPError, TimeoutException, ConnectError
-from cachetools import TTLCache
+from cachetools import TLRUCache, TTLCache
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 # Import generation modules
-from .modules.image_generation import image_generator
+from .modules.image_generation import get_image_generator
 from .modules.speech_generation import speech_generator
 from .modules.audio_transcription import audio_transcriber
 from .modules.text_humanizer import text_humanizer
@@ -27,8 +34,46 @@ HF_OCR_URL_ENV = "HF_OCR_URL"
 HF_AUDIO_TEXT_URL_ENV = "HF_AUDIO_TEXT_URL"
 DEFAULT_TIMEOUT_SECONDS = 120
 
-# Initialize cache for AI detection results (1 hour TTL, max 1000 entries)
-detection_cache = TTLCache(maxsize=1000, ttl=3600)
+# Configuration is resolved once at import instead of on every request; changes need a restart
+HF_INFERENCE_URL = os.getenv(HF_INFERENCE_URL_ENV, "").strip()
+HF_OCR_URL = os.getenv(HF_OCR_URL_ENV, "").strip()
+HF_AUDIO_TEXT_URL = os.getenv(HF_AUDIO_TEXT_URL_ENV, "").strip()
+_HF_API_KEY = os.getenv("HF_API_KEY", "").strip()
+AUTH_HEADERS = {"Authorization": f"Bearer {_HF_API_KEY}"} if _HF_API_KEY else {}
+CONTACT_EMAIL = os.getenv("CONTACT_EMAIL", "")
+RECAPTCHA_SITE_KEY = os.getenv("RECAPTCHA_SITE_KEY", "")
+RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY", "").strip()
+ADSENSE_PUB_ID = os.getenv("ADSENSE_PUB_ID", "pub-2409576003450898").strip()
+
+# AI detection results, max 1000 entries (LRU when full). Values are (result, serialized cached=True
+# body or None, hits); each hit re-stores the entry with a TTL of 1 hour per hit (capped at 8 hours),
+# so repeatedly analyzed texts stay cached while one-shots expire after the base hour
+DETECTION_CACHE_BASE_TTL = 3600
+DETECTION_CACHE_MAX_HITS = 8
+
+
+def _detection_ttu(_key, value, now):
+    return now + DETECTION_CACHE_BASE_TTL * min(value[2], DETECTION_CACHE_MAX_HITS)
+
+
+detection_cache = TLRUCache(maxsize=1000, ttu=_detection_ttu)
+
+# /analyze upstream calls in flight, keyed like detection_cache, so identical concurrent texts share one
+analysis_inflight: dict[str, asyncio.Task] = {}
+
+
+def _release_analysis(cache_key: str, task: asyncio.Task) -> None:
+    """Done-callback for analysis tasks: drop the in-flight entry and retrieve any exception.
+
+    Once every waiter has disconnected nobody awaits the task, and asyncio would log
+    "Task exception was never retrieved" when it fails; waiters still attached get the error as usual.
+    """
+    analysis_inflight.pop(cache_key, None)
+    if not task.cancelled():
+        task.exception()
+
+# Cache transcripts by audio content so re-submitted clips skip the upstream call (24 hour TTL)
+transcription_cache = TTLCache(maxsize=500, ttl=86400)
 
 # Initialize async HTTP client with connection pooling (lazy initialization)
 http_client = None
@@ -48,12 +93,28 @@ async def get_http_client():
 # Helper utilities
 # ----------------------
 def get_auth_headers() -> dict:
-    """Build optional Authorization header from HF_API_KEY."""
-    headers: dict = {}
-    api_key = os.getenv("HF_API_KEY", "").strip()
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
-    return headers
+    """Optional Authorization header from HF_API_KEY (shared; do not mutate)."""
+    return AUTH_HEADERS
+
+
+async def _read_upload(file: UploadFile, max_size: int, label: str) -> bytes:
+    """Read an upload in 64 KiB blocks, raising 413 as soon as it exceeds max_size bytes."""
+    buffer = bytearray()
+    try:
+        await file.seek(0)
+        while chunk := await file.read(64 * 1024):
+            buffer += chunk
+            if len(buffer) > max_size:
+                if max_size % (1024 * 1024) == 0:
+                    limit = f"{max_size // (1024 * 1024)}MB"
+                else:
+                    limit = f"{max_size:,} bytes"
+                raise HTTPException(status_code=413, detail=f"{label} too large. Maximum size is {limit}.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"{label} read error: {str(e)}") from e
+    return bytes(buffer)
 
 
 async def prepare_text_from_inputs(
@@ -67,25 +128,8 @@ async def prepare_text_from_inputs(
 
     submit_text: str | None = None
     if file is not None and file.filename:
-        # Optimize: Stream file reading with size limit check
         max_file_size = max_length * 2  # Allow 2x character limit in bytes
-        chunks = []
-        total_size = 0
-        
-        try:
-            # Stream file in chunks to avoid loading large files into memory
-            async for chunk in file.file:
-                total_size += len(chunk)
-                if total_size > max_file_size:
-                    raise HTTPException(
-                        status_code=413, 
-                        detail=f"File too large. Maximum size is {max_file_size:,} bytes."
-                    )
-                chunks.append(chunk)
-            
-            raw_bytes = b"".join(chunks)
-        except OSError as e:
-            raise HTTPException(status_code=400, detail=f"File read error: {str(e)}") from e
+        raw_bytes = await _read_upload(file, max_file_size, "File")
         
         try:
             submit_text = raw_bytes.decode("utf-8")
@@ -150,28 +194,26 @@ async def build_image_files(
 ) -> dict:
     """Return a httpx-compatible files dict for image upload, fetching remote URL if needed."""
     if image is not None and image.filename:
-        # Read the uploaded file with size check (max 16MB for images)
+        # Size check without reading the image (max 16MB); the spooled upload is seekable
         max_image_size = 16 * 1024 * 1024
         
         try:
-            # Use UploadFile's async read() method
-            await image.seek(0)
-            content = await image.read()
-            
-            if len(content) > max_image_size:
-                raise HTTPException(
-                    status_code=413,
-                    detail="Image file too large. Maximum size is 16MB."
-                )
-        except HTTPException:
-            raise
-        except Exception as e:
+            image.file.seek(0, os.SEEK_END)
+            size = image.file.tell()
+            image.file.seek(0)
+        except OSError as e:
             raise HTTPException(status_code=400, detail=str(e)) from e
+        if size > max_image_size:
+            raise HTTPException(
+                status_code=413,
+                detail="Image file too large. Maximum size is 16MB."
+            )
         
+        # Hand httpx the file object so the multipart body is streamed from the upload, not copied
         return {
             "image": (
                 image.filename,
-                content,
+                image.file,
                 image.content_type or "application/octet-stream",
             )
         }
@@ -198,27 +240,7 @@ async def build_audio_payload(
     """Return (files, data) tuple for audio transcription request."""
     data = {"return_timestamps": str(return_timestamps).lower()}
     if audio is not None and audio.filename:
-        # Stream read UploadFile using its async read() to avoid blocking and errors
-        max_audio_size = 25 * 1024 * 1024  # 25MB
-        total_size = 0
-        chunks: list[bytes] = []
-
-        try:
-            await audio.seek(0)
-            while True:
-                chunk = await audio.read(8192)
-                if not chunk:
-                    break
-                total_size += len(chunk)
-                if total_size > max_audio_size:
-                    raise HTTPException(
-                        status_code=413,
-                        detail="Audio file too large. Maximum size is 25MB."
-                    )
-                chunks.append(chunk)
-            content = b"".join(chunks)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Audio read error: {str(e)}") from e
+        content = await _read_upload(audio, 25 * 1024 * 1024, "Audio file")
 
         files = {
             "audio": (
@@ -239,22 +261,10 @@ async def get_audio_bytes_and_format(
 ) -> tuple[bytes, str]:
     """Return raw audio bytes and inferred format (mp3|wav) from upload or URL."""
     max_audio_size = 25 * 1024 * 1024  # 25MB limit
+    chunk_size = 64 * 1024
+    too_large = HTTPException(status_code=413, detail="Audio file too large. Maximum size is 25MB.")
     if audio is not None and audio.filename:
-        total_size = 0
-        chunks: list[bytes] = []
-        try:
-            await audio.seek(0)
-            while True:
-                chunk = await audio.read(8192)
-                if not chunk:
-                    break
-                total_size += len(chunk)
-                if total_size > max_audio_size:
-                    raise HTTPException(status_code=413, detail="Audio file too large. Maximum size is 25MB.")
-                chunks.append(chunk)
-            content = b"".join(chunks)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Audio read error: {str(e)}") from e
+        content = await _read_upload(audio, max_audio_size, "Audio file")
 
         # Infer format from filename or content type
         ext = (audio.filename.rsplit(".", 1)[-1].lower() if "." in audio.filename else "").strip()
@@ -263,18 +273,25 @@ async def get_audio_bytes_and_format(
         return content, audio_format
 
     if audio_url:
+        buffer = bytearray()
         try:
             client = await get_http_client()
-            r = await client.get(audio_url.strip(), timeout=30, headers={"User-Agent": "TextSense-Relay/1.0"})
-            r.raise_for_status()
+            # Stream the body so oversized downloads are cut off without buffering them fully
+            async with client.stream(
+                "GET", audio_url.strip(), timeout=30, headers={"User-Agent": "TextSense-Relay/1.0"}
+            ) as r:
+                r.raise_for_status()
+                content_length = int(r.headers.get("content-length", 0))
+                if content_length and content_length > max_audio_size:
+                    raise too_large
+                mime = r.headers.get("content-type", "application/octet-stream").split(";")[0].strip().lower()
+                async for chunk in r.aiter_bytes(chunk_size):
+                    buffer += chunk
+                    if len(buffer) > max_audio_size:
+                        raise too_large
         except (HTTPError, TimeoutException, ConnectError) as req_err:
             raise HTTPException(status_code=502, detail=f"Failed to fetch audio URL: {str(req_err)}") from req_err
 
-        content_length = int(r.headers.get("content-length", 0))
-        if content_length and content_length > max_audio_size:
-            raise HTTPException(status_code=413, detail="Audio file too large. Maximum size is 25MB.")
-
-        mime = r.headers.get("content-type", "application/octet-stream").split(";")[0].strip().lower()
         # Try infer format from URL extension if present
         name = audio_url.split("?")[0].rstrip("/").split("/")[-1]
         ext = (name.rsplit(".", 1)[-1].lower() if "." in name else "").strip()
@@ -286,13 +303,13 @@ async def get_audio_bytes_and_format(
             fmt = "wav"
         else:
             fmt = ""
-        return r.content, fmt
+        return bytes(buffer), fmt
 
     raise HTTPException(status_code=400, detail="No audio provided.")
 
 
 def get_remote_url() -> str:
-    remote = os.getenv(HF_INFERENCE_URL_ENV, "").strip()
+    remote = HF_INFERENCE_URL
     if not remote:
         raise RuntimeError(
             "No remote inference URL configured. Set HF_INFERENCE_URL to your Hugging Face Space /analyze endpoint."
@@ -301,7 +318,7 @@ def get_remote_url() -> str:
 
 
 def get_ocr_url() -> str:
-    remote = os.getenv(HF_OCR_URL_ENV, "").strip()
+    remote = HF_OCR_URL
     if not remote:
         raise RuntimeError(
             "No OCR URL configured. Set HF_OCR_URL to your Hugging Face Space OCR endpoint."
@@ -310,7 +327,7 @@ def get_ocr_url() -> str:
 
 
 def get_audio_text_url() -> str:
-    remote = os.getenv(HF_AUDIO_TEXT_URL_ENV, "").strip()
+    remote = HF_AUDIO_TEXT_URL
     if not remote:
         raise RuntimeError(
             "No AUDIO URL configured. Set HF_AUDIO_TEXT_URL to your Hugging Face Space AUDIO endpoint."
@@ -318,218 +335,319 @@ def get_audio_text_url() -> str:
     return remote
 
 
-app = FastAPI(title="TextSense Relay (FastAPI)")
+app = FastAPI(title="TextSense Relay (FastAPI)", default_response_class=ORJSONResponse)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Only text-like bodies are compressed; MP3 and image streams are already compressed and
+# gzipping them costs CPU and latency for no size win
+_GZIP_CONTENT_TYPES = ("text/", "application/json", "application/javascript", "application/manifest+json")
+
+
+class TextGZipMiddleware:
+    """GZip JSON/HTML/text responses for clients that accept it; other bodies pass through."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 512, compresslevel: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if (
+                    not headers.get("content-type", "").startswith(_GZIP_CONTENT_TYPES)
+                    or "content-encoding" in headers
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                # wbits=31 writes a gzip header and trailer around the deflate stream
+                compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                data = compressor.compress(body)
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                else:
+                    data += compressor.flush()
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                start = None
+            else:
+                data = compressor.compress(body)
+                if not more_body:
+                    data += compressor.flush()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Compress JSON/HTML responses; /analyze payloads with segment lists compress 5-8x
+app.add_middleware(TextGZipMiddleware, minimum_size=512)
+
 # Static and templates
 app.mount("/static", StaticFiles(directory="src/templates/static"), name="static")
 templates = Jinja2Templates(directory="src/templates")
 
 
+# Response header sets, built once; the middleware only copies them onto each response
+# Static assets also get nosniff and Vary (CDN optimization)
+_STATIC_EXTRA_HEADERS = (("X-Content-Type-Options", "nosniff"), ("Vary", "Accept-Encoding"))
+# CSS files: shorter cache (1 hour) to allow updates
+_STATIC_CSS_HEADERS = (("Cache-Control", "public, max-age=3600, must-revalidate"),) + _STATIC_EXTRA_HEADERS
+# Images and JS: longer cache (1 week) but not immutable
+_STATIC_LONG_HEADERS = (("Cache-Control", "public, max-age=604800"),) + _STATIC_EXTRA_HEADERS
+# Other static files: moderate cache (1 day)
+_STATIC_DEFAULT_HEADERS = (("Cache-Control", "public, max-age=86400"),) + _STATIC_EXTRA_HEADERS
+_STATIC_LONG_SUFFIXES = (".js", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".svg")
+# HTML pages: no cache to ensure updates are immediate
+_HTML_NO_CACHE_HEADERS = (
+    ("Cache-Control", "no-cache, no-store, must-revalidate"),
+    ("Pragma", "no-cache"),
+    ("Expires", "0"),
+)
+# Security headers for all responses
+_SECURITY_HEADERS = (
+    ("X-Frame-Options", "SAMEORIGIN"),
+    ("X-XSS-Protection", "1; mode=block"),
+    ("Referrer-Policy", "strict-origin-when-cross-origin"),
+)
+
+
 # Middleware to add cache headers to static files
 @app.middleware("http")
 async def add_cache_and_cdn_headers(request: Request, call_next):
     response = await call_next(request)
+    headers = response.headers
+    # The raw scope path; request.url would build and parse a full URL object just to read it
+    path = request.scope["path"]
     
     # Add cache headers for static assets
-    if request.url.path.startswith("/static/"):
-        # Check if it's a CSS file - use shorter cache for CSS to allow updates
-        if request.url.path.endswith(".css"):
-            # CSS files: shorter cache (1 hour) to allow updates
-            response.headers["Cache-Control"] = "public, max-age=3600, must-revalidate"
-        elif request.url.path.endswith((".js", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".svg")):
-            # Images and JS: longer cache (1 week) but not immutable
-            response.headers["Cache-Control"] = "public, max-age=604800"
+    if path.startswith("/static/"):
+        if path.endswith(".css"):
+            extra = _STATIC_CSS_HEADERS
+        elif path.endswith(_STATIC_LONG_SUFFIXES):
+            extra = _STATIC_LONG_HEADERS
         else:
-            # Other static files: moderate cache (1 day)
-            response.headers["Cache-Control"] = "public, max-age=86400"
-        
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        
-        # CDN optimization headers
-        response.headers["Vary"] = "Accept-Encoding"
+            extra = _STATIC_DEFAULT_HEADERS
         
         # Add ETag for better cache validation
         if hasattr(response, 'body') and response.body:
-            import hashlib
             etag = hashlib.md5(response.body).hexdigest()
-            response.headers["ETag"] = f'"{etag}"'
+            headers["ETag"] = f'"{etag}"'
     
     # Add cache headers for HTML pages - prevent aggressive caching
-    elif response.headers.get("content-type", "").startswith("text/html"):
-        # HTML pages: no cache to ensure updates are immediate
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+    elif headers.get("content-type", "").startswith("text/html"):
+        extra = _HTML_NO_CACHE_HEADERS
+    else:
+        extra = ()
     
-    # Add security headers for all responses
-    response.headers["X-Frame-Options"] = "SAMEORIGIN"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+    for name, value in extra:
+        headers[name] = value
+    for name, value in _SECURITY_HEADERS:
+        headers[name] = value
     
     return response
 
 
+# Bytes outside [A-Za-z0-9._-], deleted from download filenames in one C-level translate
+_FILENAME_UNSAFE_BYTES = bytes(
+    b for b in range(256)
+    if not (chr(b).isascii() and (chr(b).isalnum() or chr(b) in "._-"))
+)
+
+
+def sanitize_filename(filename: str, default: str = "generated_image") -> str:
+    """Reduce a client-supplied filename to characters safe inside a Content-Disposition header."""
+    sanitized = filename.encode("ascii", "ignore").translate(None, _FILENAME_UNSAFE_BYTES).decode("ascii")
+    return sanitized.lstrip(".") or default
+
+
 def get_cache_key(text: str) -> str:
     """Generate cache key from text content."""
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
+def shape_analysis_response(result: dict, request: Request) -> dict:
+    """Apply opt-in response trimming: ?omit_cleaned=1 replaces cleaned_text with its hash."""
+    if request.query_params.get("omit_cleaned") != "1":
+        return result
+    cleaned_text = result.get("cleaned_text") or ""
+    return {
+        **result,
+        "cleaned_text": None,
+        "text_hash": hashlib.blake2b(cleaned_text.encode("utf-8")).hexdigest(),
+    }
+
+
 def get_cache_bust_version() -> str:
     """Generate cache busting version based on current date."""
     from datetime import datetime
     return datetime.now().strftime("%Y%m%d%H")
 
 
+# Pages only depend on configuration and the hourly cache_version, so each is rendered once per version
+PAGE_CONTEXT = {"contact_email": CONTACT_EMAIL, "recaptcha_site_key": RECAPTCHA_SITE_KEY}
+_rendered_pages: dict[str, bytes] = {}
+_rendered_pages_version = ""
+
+
+def render_page(name: str) -> HTMLResponse:
+    """Serve a page template from the per-version render cache."""
+    global _rendered_pages_version
+    version = get_cache_bust_version()
+    if version != _rendered_pages_version:
+        _rendered_pages.clear()
+        _rendered_pages_version = version
+    body = _rendered_pages.get(name)
+    if body is None:
+        body = templates.get_template(name).render(PAGE_CONTEXT, cache_version=version).encode("utf-8")
+        _rendered_pages[name] = body
+    return HTMLResponse(body)
+
+
+# Root-level icons and manifest are tiny and immutable: read each once and serve it from memory
+_ROOT_ASSET_TYPES = {
+    "favicon.ico": "image/vnd.microsoft.icon",
+    "site.webmanifest": "application/manifest+json",
+    "apple-touch-icon.png": "image/png",
+    "favicon-32x32.png": "image/png",
+    "favicon-16x16.png": "image/png",
+    "android-chrome-192x192.png": "image/png",
+    "android-chrome-512x512.png": "image/png",
+}
+_ROOT_ASSET_HEADERS = {"Cache-Control": "public, max-age=604800"}
+
+
+@functools.cache
+def _root_asset_bytes(name: str) -> bytes:
+    with open(f"src/templates/static/{name}", "rb") as f:
+        return f.read()
+
+
+def root_asset_response(name: str) -> Response:
+    return Response(_root_asset_bytes(name), media_type=_ROOT_ASSET_TYPES[name], headers=_ROOT_ASSET_HEADERS)
+
+
 @app.get("/favicon.ico")
 async def favicon():
-    return FileResponse("src/templates/static/favicon.ico")
+    return root_asset_response("favicon.ico")
 
 
 @app.get("/site.webmanifest")
 async def site_webmanifest():
-    return FileResponse("src/templates/static/site.webmanifest", media_type="application/manifest+json")
+    return root_asset_response("site.webmanifest")
 
 
 @app.get("/apple-touch-icon.png")
 async def apple_touch_icon():
-    return FileResponse("src/templates/static/apple-touch-icon.png")
+    return root_asset_response("apple-touch-icon.png")
 
 
 @app.get("/favicon-32x32.png")
 async def favicon_32x32():
-    return FileResponse("src/templates/static/favicon-32x32.png")
+    return root_asset_response("favicon-32x32.png")
 
 
 @app.get("/favicon-16x16.png")
 async def favicon_16x16():
-    return FileResponse("src/templates/static/favicon-16x16.png")
+    return root_asset_response("favicon-16x16.png")
 
 
 @app.get("/android-chrome-192x192.png")
 async def android_chrome_192():
-    return FileResponse("src/templates/static/android-chrome-192x192.png")
+    return root_asset_response("android-chrome-192x192.png")
 
 
 @app.get("/android-chrome-512x512.png")
 async def android_chrome_512():
-    return FileResponse("src/templates/static/android-chrome-512x512.png")
+    return root_asset_response("android-chrome-512x512.png")
 
 
 @app.get("/", response_class=HTMLResponse)
 @app.head("/")
 async def index(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("index.html", context)
+    return render_page("index.html")
 
 
 @app.get("/about", response_class=HTMLResponse)
 async def about(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("about.html", context)
+    return render_page("about.html")
 
 
 @app.get("/privacy", response_class=HTMLResponse)
 async def privacy(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("privacy.html", context)
+    return render_page("privacy.html")
 
 
 @app.get("/terms", response_class=HTMLResponse)
 async def terms(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("terms.html", context)
+    return render_page("terms.html")
 
 
 @app.get("/contact", response_class=HTMLResponse)
 async def contact(request: Request):
-    context = {
-        "request": request,
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "recaptcha_site_key": os.getenv("RECAPTCHA_SITE_KEY", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("contact.html", context)
+    return render_page("contact.html")
 
 
 @app.get("/ocr", response_class=HTMLResponse)
 async def ocr_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("ocr.html", context)
+    return render_page("ocr.html")
 
 
 @app.get("/audio-text", response_class=HTMLResponse)
 async def audio_text_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("audio-text.html", context)
+    return render_page("audio-text.html")
 
 
 @app.get("/ai-detector", response_class=HTMLResponse)
 async def ai_detector_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("ai-detector.html", context)
+    return render_page("ai-detector.html")
 
 
 @app.get("/ai-humanizer", response_class=HTMLResponse)
 async def ai_humanizer_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("ai-humanizer.html", context)
+    return render_page("ai-humanizer.html")
 
 
 @app.get("/generate-image", response_class=HTMLResponse)
 async def generate_image_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("generate-image.html", context)
+    return render_page("generate-image.html")
 
 
 @app.get("/text-to-speech", response_class=HTMLResponse)
 async def text_to_speech_page(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("text-to-speech.html", context)
+    return render_page("text-to-speech.html")
 
 
 @app.post("/contact")
@@ -541,7 +659,7 @@ async def submit_contact(request: Request):
     message = (form.get("message") or "").strip()
     token = (form.get("g-recaptcha-response") or "").strip()
 
-    secret = os.getenv("RECAPTCHA_SECRET_KEY", "").strip()
+    secret = RECAPTCHA_SECRET_KEY
     if secret:
         try:
             client = await get_http_client()
@@ -553,89 +671,66 @@ async def submit_contact(request: Request):
             if verify.status_code == 200:
                 result = verify.json()
                 if not result.get("success"):
-                    return JSONResponse({"ok": False, "error": "reCAPTCHA verification failed"}, status_code=400)
+                    return ORJSONResponse({"ok": False, "error": "reCAPTCHA verification failed"}, status_code=400)
         except (TimeoutException, ConnectError) as net_err:
-            return JSONResponse({"ok": False, "error": f"reCAPTCHA network error: {str(net_err)}"}, status_code=400)
+            return ORJSONResponse({"ok": False, "error": f"reCAPTCHA network error: {str(net_err)}"}, status_code=400)
         except HTTPError as req_err:
-            return JSONResponse({"ok": False, "error": f"reCAPTCHA request error: {str(req_err)}"}, status_code=400)
+            return ORJSONResponse({"ok": False, "error": f"reCAPTCHA request error: {str(req_err)}"}, status_code=400)
 
-    return JSONResponse({"ok": True, "received": {"name": name, "email": email, "message": message}})
+    return ORJSONResponse({"ok": True, "received": {"name": name, "email": email, "message": message}})
 
 
 @app.get("/cookies", response_class=HTMLResponse)
 async def cookies(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("cookies.html", context)
+    return render_page("cookies.html")
 
 
 @app.get("/technology/ai-detector", response_class=HTMLResponse)
 async def technology_ai_detector(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-ai-detector.html", context)
+    return render_page("technology-ai-detector.html")
 
 
 @app.get("/technology/ocr", response_class=HTMLResponse)
 async def technology_ocr(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-ocr.html", context)
+    return render_page("technology-ocr.html")
 
 
 @app.get("/technology/audio-text", response_class=HTMLResponse)
 async def technology_audio_text(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-audio-text.html", context)
+    return render_page("technology-audio-text.html")
 
 
 @app.get("/technology/text-to-speech", response_class=HTMLResponse)
 async def technology_text_to_speech(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-text-to-speech.html", context)
+    return render_page("technology-text-to-speech.html")
 
 
 @app.get("/technology/text-to-image", response_class=HTMLResponse)
 async def technology_text_to_image(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-text-to-image.html", context)
+    return render_page("technology-text-to-image.html")
 
 
 @app.get("/technology/ai-humanizer", response_class=HTMLResponse)
 async def technology_ai_humanizer(request: Request):
-    context = {
-        "request": request, 
-        "contact_email": os.getenv("CONTACT_EMAIL", ""),
-        "cache_version": get_cache_bust_version()
-    }
-    return templates.TemplateResponse("technology-ai-humanizer.html", context)
+    return render_page("technology-ai-humanizer.html")
 
 
 @app.get("/ads.txt", response_class=PlainTextResponse)
 async def ads_txt():
-    pub_id = os.getenv("ADSENSE_PUB_ID", "pub-2409576003450898").strip()
-    return f"google.com, {pub_id}, DIRECT, f08c47fec0942fa0"
+    return f"google.com, {ADSENSE_PUB_ID}, DIRECT, f08c47fec0942fa0"
+
+
+async def run_analysis(remote_url: str, headers: dict, submit_text: str, cache_key: str) -> dict:
+    """Call the inference service for one text and cache the result."""
+    result = await forward_post_json(
+        remote_url,
+        data={"text": submit_text},
+        headers=headers,
+        context="Analyze",
+    )
+    result["cached"] = False
+    detection_cache[cache_key] = (result, None, 1)
+    return result
 
 
 @app.post("/analyze")
@@ -649,26 +744,33 @@ async def analyze(
     
     # Check cache first
     cache_key = get_cache_key(submit_text)
-    if cache_key in detection_cache:
-        cached_result = detection_cache[cache_key]
-        cached_result["cached"] = True
-        return JSONResponse(cached_result)
-    
-    # Call remote API
-    remote_url = get_remote_url()
-    headers = get_auth_headers()
-    result = await forward_post_json(
-        remote_url,
-        data={"text": submit_text},
-        headers=headers,
-        context="Analyze",
-    )
+    # Single lookup: a membership test followed by indexing can race the TTL expiry and raise KeyError
+    cached_entry = detection_cache.get(cache_key)
+    if cached_entry is not None:
+        cached_result, cached_body, hits = cached_entry
+        if request.query_params.get("omit_cleaned") == "1":
+            # Copy rather than flag the shared cached dict in place
+            response = ORJSONResponse(shape_analysis_response({**cached_result, "cached": True}, request))
+        else:
+            # The cached=True body is serialized on the first hit; later hits send the bytes as-is
+            if cached_body is None:
+                cached_body = orjson.dumps({**cached_result, "cached": True})
+            response = Response(cached_body, media_type="application/json")
+        detection_cache[cache_key] = (cached_result, cached_body, hits + 1)
+        return response
     
-    # Cache the result
-    result["cached"] = False
-    detection_cache[cache_key] = result
+    # Call remote API, joining an identical analysis already in flight instead of posting again
+    task = analysis_inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(
+            run_analysis(get_remote_url(), get_auth_headers(), submit_text, cache_key)
+        )
+        analysis_inflight[cache_key] = task
+        task.add_done_callback(functools.partial(_release_analysis, cache_key))
+    # Shield so a disconnecting caller does not cancel the call other callers are waiting on
+    result = await asyncio.shield(task)
     
-    return JSONResponse(result)
+    return ORJSONResponse(shape_analysis_response(result, request))
 
 
 @app.post("/humanize-text")
@@ -681,7 +783,7 @@ async def humanize_text(
     """Humanize text to reduce AI detection likelihood."""
     try:
         result, metrics = await text_humanizer.humanize_text(text, intensity)
-        return JSONResponse({
+        return ORJSONResponse({
             "humanized_text": result,
             "metrics": metrics
         })
@@ -708,10 +810,10 @@ async def ocr(
             headers=headers,
             context="OCR",
         )
-        return JSONResponse(result)
+        return ORJSONResponse(result)
     except HTTPException as e:
         # Return error in JSON format that the frontend expects
-        return JSONResponse({"error": e.detail}, status_code=e.status_code)
+        return ORJSONResponse({"error": e.detail}, status_code=e.status_code)
 
 
 @app.post("/audio-transcribe")
@@ -729,6 +831,13 @@ async def audio_transcribe(
     if normalized_fmt not in {"mp3", "wav"}:
         raise HTTPException(status_code=400, detail="Unsupported audio format. Only MP3 and WAV are supported.")
 
+    # Identical audio with identical options always yields the same transcript
+    audio_hash = hashlib.sha256(audio_bytes).hexdigest()
+    cache_key = f"{audio_hash}:{normalized_fmt}:{audio_type or ''}:{language or ''}"
+    cached_text = transcription_cache.get(cache_key)
+    if cached_text is not None:
+        return ORJSONResponse({"text": cached_text, "cached": True})
+
     try:
         openai_json = await audio_transcriber.transcribe(
             audio_bytes=audio_bytes,
@@ -753,10 +862,13 @@ async def audio_transcribe(
                 except Exception:
                     extracted_text = ""
 
+        if extracted_text:
+            transcription_cache[cache_key] = extracted_text
+
         response_body = {
             "text": extracted_text,
         }
-        return JSONResponse(response_body)
+        return ORJSONResponse(response_body)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except RuntimeError as re:
@@ -775,7 +887,7 @@ async def generate_image(
     negative_prompt: Optional[str] = Form("")
 ):
     try:
-        result = await image_generator.generate_images(
+        result = await get_image_generator().generate_images(
             prompt=prompt,
             negative_prompt=negative_prompt,
             aspect_ratio=aspect_ratio,
@@ -784,13 +896,25 @@ async def generate_image(
             enable_safety_checker=enable_safety_checker,
             model="flux"
         )
-        return JSONResponse(result)
+        return ORJSONResponse(result)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve)) from ve
     except RuntimeError as re:
         raise HTTPException(status_code=500, detail=f"Image generation runtime error: {str(re)}") from re
 
 
+@app.post("/prefetch-enhancement")
+@limiter.limit("20/minute")  # Rate limit: debounced typing prefetches; each is at most one upstream call
+async def prefetch_enhancement(
+    request: Request,
+    prompt: str = Form(...),
+    negative_prompt: Optional[str] = Form(""),
+):
+    # Fire-and-forget: the enhanced prompt lands in the cache for the following /generate-image call
+    scheduled = get_image_generator().prefetch_enhancement(prompt, negative_prompt)
+    return ORJSONResponse({"scheduled": scheduled}, status_code=202)
+
+
 @app.post("/generate-speech")
 @limiter.limit("3/minute")  # Rate limit: 3 speech generation requests per minute (expensive operation)
 async def generate_speech(
@@ -820,38 +944,43 @@ async def download_image(request: Request, url: str, filename: str = "generated_
     if not url.startswith("https://image.pollinations.ai/"):
         raise HTTPException(status_code=400, detail="Invalid image URL")
 
+    filename = sanitize_filename(filename)
     try:
         client = await get_http_client()
-        async with client.stream("GET", url, timeout=30) as response:
-            response.raise_for_status()
-            
-            # Check file size to prevent abuse (max 100MB)
-            content_length = int(response.headers.get("content-length", 0))
-            if content_length > 100 * 1024 * 1024:
-                raise HTTPException(status_code=413, detail="File too large (max 100MB)")
-            
-            content_type = response.headers.get("content-type", "image/png")
-            if not filename.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
-                if "jpeg" in content_type:
-                    filename += ".jpg"
-                elif "webp" in content_type:
-                    filename += ".webp"
-                else:
-                    filename += ".png"
-
-            async def stream_content():
-                async for chunk in response.aiter_bytes(chunk_size=8192):
-                    yield chunk
-
-            return StreamingResponse(
-                stream_content(),
-                media_type=content_type,
-                headers={"Content-Disposition": f"attachment; filename={filename}", "Cache-Control": "no-cache"}
-            )
-    except HTTPException:
-        raise
+        # Opened without a context manager: the body is read after this handler returns, so the
+        # stream is closed by the response's background task instead
+        response = await client.send(client.build_request("GET", url, timeout=30), stream=True)
     except (HTTPError, TimeoutException, ConnectError) as req_err:
         raise HTTPException(status_code=502, detail=f"Image download failed: {str(req_err)}") from req_err
+    try:
+        response.raise_for_status()
+        
+        # Check file size to prevent abuse (max 100MB)
+        content_length = int(response.headers.get("content-length", 0))
+        if content_length > 100 * 1024 * 1024:
+            raise HTTPException(status_code=413, detail="File too large (max 100MB)")
+    except HTTPError as req_err:
+        await response.aclose()
+        raise HTTPException(status_code=502, detail=f"Image download failed: {str(req_err)}") from req_err
+    except BaseException:
+        await response.aclose()
+        raise
+    
+    content_type = response.headers.get("content-type", "image/png")
+    if not filename.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
+        if "jpeg" in content_type:
+            filename += ".jpg"
+        elif "webp" in content_type:
+            filename += ".webp"
+        else:
+            filename += ".png"
+
+    return StreamingResponse(
+        response.aiter_bytes(chunk_size=64 * 1024),
+        media_type=content_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-cache"},
+        background=BackgroundTask(response.aclose),
+    )
 
 
 @app.get("/healthz")
@@ -870,6 +999,12 @@ async def shutdown_event():
     try:
         if http_client is not None:
             await http_client.aclose()
+        await audio_transcriber.aclose()
+        await speech_generator.aclose()
+        await text_humanizer.aclose()
+        # Only close the image generator if a request ever created it
+        if get_image_generator.cache_info().currsize:
+            await get_image_generator().aclose()
     except Exception as e:
         # Ignore cleanup errors during shutdown
         pass
@@ -11,6 +11,7 @@ import logging
 from typing import Optional, Tuple
 
 import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,25 @@ class AudioTranscriber:
         else:
             logger.warning("OPENAI_SPEECH_TOKEN not set - API may require authentication")
 
+        # Shared pooled client, created lazily on first use
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP/2 client so keep-alive connections and TLS sessions are reused."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(connect=5.0, read=120.0, write=120.0, pool=5.0),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled client (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     def _get_headers(self) -> dict[str, str]:
         headers = {
             "User-Agent": "TextSense-STT/1.0",
@@ -104,47 +124,53 @@ class AudioTranscriber:
             raise ValueError("Unsupported audio format. Only mp3 and wav are supported.")
 
         headers = self._get_headers()
-
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            if "/audio/transcriptions" in (self.api_url or ""):
-                filename = f"audio.{normalized_format}"
-                mimetype = "audio/mpeg" if normalized_format == "mp3" else "audio/wav"
-                data: dict[str, str] = {"model": os.getenv("OPENAI_CHAT_AUDIO_MODEL")}
-                if language:
-                    data["language"] = language
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    data=data,
-                    files={"file": (filename, audio_bytes, mimetype)},
-                )
-            else:
-                b64 = base64.b64encode(audio_bytes).decode("utf-8")
-                system_text = self._build_system_prompt(audio_type)
-                payload: dict = {
-                    "model": os.getenv("OPENAI_CHAT_AUDIO_MODEL"),
-                    "private": True,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": [
-                                {"type": "text", "text": system_text}
-                            ],
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": question},
-                                {"type": "input_audio", "input_audio": {"data": b64, "format": normalized_format}},
-                            ],
-                        },
-                    ],
-                }
-                if language:
-                    payload["language"] = language
-                json_headers = dict(headers)
-                json_headers["Content-Type"] = "application/json"
-                response = await client.post(self.api_url, headers=json_headers, json=payload)
+        client = self._get_client()
+        request_timeout = httpx.Timeout(timeout_seconds, connect=5.0, pool=5.0)
+
+        if "/audio/transcriptions" in (self.api_url or ""):
+            filename = f"audio.{normalized_format}"
+            mimetype = "audio/mpeg" if normalized_format == "mp3" else "audio/wav"
+            data: dict[str, str] = {"model": os.getenv("OPENAI_CHAT_AUDIO_MODEL")}
+            if language:
+                data["language"] = language
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                data=data,
+                files={"file": (filename, audio_bytes, mimetype)},
+                timeout=request_timeout,
+            )
+        else:
+            # ASCII decode is cheaper than UTF-8 and base64 output is always ASCII
+            b64 = base64.b64encode(audio_bytes).decode("ascii")
+            system_text = self._build_system_prompt(audio_type)
+            payload: dict = {
+                "model": os.getenv("OPENAI_CHAT_AUDIO_MODEL"),
+                "private": True,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": [
+                            {"type": "text", "text": system_text}
+                        ],
+                    },
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": question},
+                            {"type": "input_audio", "input_audio": {"data": b64, "format": normalized_format}},
+                        ],
+                    },
+                ],
+            }
+            if language:
+                payload["language"] = language
+            json_headers = dict(headers)
+            json_headers["Content-Type"] = "application/json"
+            # Serialize with orjson and send raw bytes instead of letting httpx re-encode via stdlib json
+            response = await client.post(
+                self.api_url, headers=json_headers, content=orjson.dumps(payload), timeout=request_timeout
+            )
 
         if response.status_code != 200:
             try:
@@ -6,24 +6,68 @@ Handles Flux image generation with prompt enhancement
 from __future__ import annotations
 
 import os
+import re
+import asyncio
+import functools
+import logging
+import hashlib
 import random
+import secrets
 import urllib.parse
+from types import MappingProxyType
 from typing import Any
 import httpx
+import orjson
+from cachetools import TTLCache
 
+# Redis is optional; without it the enhancement cache stays per-process
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
 
-class ImageGenerator:
-    """Handles AI image generation using Pollinations Flux model with prompt enhancement."""
-    
-    def __init__(self):
-        self.text_api_url = os.getenv("FLUX_TEXT_URL", "").strip()
-        self.image_api_base = os.getenv("FLUX_IMAGE_BASE", "").strip()
-        self.auth_token = os.getenv("FLUX_API_KEY", "").strip()
-        self.enhancement_system_prompt = self._get_enhancement_prompt()
-    
-    def _get_enhancement_prompt(self) -> str:
-        """Get the system prompt for AI-powered prompt enhancement."""
-        return """
+# diskcache is optional; with it the enhancement cache survives restarts (ENHANCE_CACHE_DIR)
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Phrases the enhancer's system prompt steers it to write; prompts already carrying several are
+# previous enhancer output being resubmitted
+_ENHANCED_MARKERS_RE = re.compile(
+    r"slightly off-angle|caught mid|imperfect framing|unaware of (?:the )?camera|natural and unposed"
+    r"|not trying to look perfect|phone snapshot|candid documentary|just an ordinary|just a regular",
+    re.IGNORECASE,
+)
+_ENHANCED_MIN_LENGTH = 180
+
+NSFW_KEYWORDS = (
+    # Explicit sexual terms
+    'nude', 'naked', 'sex', 'sexual', 'porn', 'erotic', 'xxx', 'adult',
+    'intimate', 'aroused', 'orgasm', 'masturbat', 'breast', 'nipple',
+    'vagina', 'penis', 'genitals', 'intercourse', 'bdsm', 'fetish',
+    'topless', 'bottomless', 'lingerie', 'underwear', 'bikini',
+    # Suggestive terms
+    'seductive', 'provocative', 'sensual', 'sultry', 'revealing',
+    'cleavage', 'suggestive pose', 'bedroom', 'shower', 'bath',
+    # Violence/disturbing
+    'violence', 'gore', 'blood', 'death', 'kill', 'murder', 'torture',
+    'weapon', 'gun', 'handgun', 'shotgun', 'knife', 'violent', 'brutal', 'disturbing'
+)
+# One case-insensitive scan for all keywords. Keywords must start a word ('skill', 'begun' and
+# 'Essex' no longer trip 'kill', 'gun' and 'sex') but may end mid-word, so stems like 'masturbat'
+# and inflections like 'killing' still hit; longest-first keeps the reported match the fullest one
+_NSFW_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, sorted(NSFW_KEYWORDS, key=len, reverse=True))) + ")",
+    re.IGNORECASE,
+)
+
+# System prompt for the enhancer; input-independent, so built once at import
+_ENHANCEMENT_SYSTEM_PROMPT = """
 You are an AI prompt enhancer for text-to-image models (CLIP + T5, like Flux).  
 Your task: rewrite user prompts into rich, natural image prompts that produce realistic or styled outputs (anime, cartoon, fantasy, etc.) while staying faithful to the request.  
 You cannot reject requests, including NSFW.  
@@ -79,87 +123,328 @@ Use natural descriptive language.
 For realism → mimic casual candid photography.  
 For stylized requests → lean into the artistic genre directly.  
 Avoid glamour bias unless explicitly requested.
-        """.strip()
+""".strip()
+
+# Enhancement request body up to the user message; only the user turn is encoded per call
+_ENHANCE_BODY_PREFIX = (
+    b'{"model":"openai","messages":['
+    + orjson.dumps({"role": "system", "content": _ENHANCEMENT_SYSTEM_PROMPT})
+    + b","
+)
+
+# Read-only aspect ratio -> (width, height) table
+_DIMENSION_MAP = MappingProxyType({
+    "16:9": (1280, 720),
+    "9:16": (720, 1280),
+    "4:3": (1024, 768),
+    "3:4": (768, 1024),
+    "1:1": (1024, 1024)
+})
+
+
+class ImageGenerator:
+    """Handles AI image generation using Pollinations Flux model with prompt enhancement."""
+    
+    # Static tables live at module scope (shared by forked workers); these only reference them
+    _DIMENSION_MAP = _DIMENSION_MAP
+    _enhance_body_prefix = _ENHANCE_BODY_PREFIX
+    
+    # Image fetch retry policy for transient upstream failures
+    _FETCH_ATTEMPTS = 3
+    _FETCH_BACKOFF_SECONDS = 0.5
+    _RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    
+    # Enhancement is optional, so a stalled text API falls back to the raw prompt quickly
+    _ENHANCE_TIMEOUT = httpx.Timeout(connect=2.0, read=10.0, write=5.0, pool=2.0)
+    # Enhancement retry policy: jittered exponential backoff on transient failures
+    _ENHANCE_ATTEMPTS = 3
+    _ENHANCE_BACKOFF_SECONDS = 0.5
+    _ENHANCE_BACKOFF_MAX_SECONDS = 4.0
+    # Retries must start within this window, bounding the total to about window + one read timeout
+    _ENHANCE_RETRY_WINDOW_SECONDS = 5.0
+    
+    def __init__(self):
+        self.text_api_url = os.getenv("FLUX_TEXT_URL", "").strip()
+        self.image_api_base = os.getenv("FLUX_IMAGE_BASE", "").strip()
+        self._image_api_prefix = self.image_api_base.rstrip("/") + "/prompt/"
+        self.auth_token = os.getenv("FLUX_API_KEY", "").strip()
+        self.enhancement_system_prompt = _ENHANCEMENT_SYSTEM_PROMPT
+        # Request pieces that never change between calls are built once
+        # httpx already advertises and transparently decodes gzip/deflate (and br when brotli is installed)
+        self._enhance_headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self.auth_token:
+            self._enhance_headers["Authorization"] = f"Bearer {self.auth_token}"
+        self._cache_key_base = hashlib.blake2b(
+            self.enhancement_system_prompt.encode("utf-8") + b"\x00", digest_size=16
+        )
+        # Enhanced prompts keyed by hash of (system prompt, user prompt); 1 hour TTL
+        self._enhance_cache: TTLCache = TTLCache(
+            maxsize=int(os.getenv("ENHANCE_CACHE_SIZE", "1024")),
+            ttl=int(os.getenv("ENHANCE_CACHE_TTL", "3600")),
+        )
+        # Prompts whose enhancement just failed; retries inside the window skip the upstream call
+        self._enhance_failures: TTLCache = TTLCache(
+            maxsize=1024, ttl=int(os.getenv("ENHANCE_FAILURE_TTL", "120"))
+        )
+        self.cache_stats = {"hits": 0, "misses": 0}
+        # Optional shared tier so all workers/replicas reuse enhancements (REDIS_URL)
+        self.redis_url = os.getenv("REDIS_URL", "").strip()
+        self.redis_ttl = int(os.getenv("ENHANCE_REDIS_TTL", "14400"))
+        self._redis = None
+        # Optional on-disk tier (SQLite-backed, safe across local workers) so restarts keep paid work
+        self.disk_cache_dir = os.getenv("ENHANCE_CACHE_DIR", "").strip()
+        self.disk_ttl = int(os.getenv("ENHANCE_DISK_TTL", str(7 * 86400)))
+        self._disk = None
+        self._disk_lock = asyncio.Lock()
+        # Enhancement requests in flight, keyed like the cache, and background prefetches
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._prefetch_tasks: set[asyncio.Task] = set()
+        # Shared pooled client, created lazily on first use
+        self._client: httpx.AsyncClient | None = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP/2 client so keep-alive connections and TLS sessions are reused."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=30.0),
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the pooled client, Redis connection and disk cache (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.close)
+            self._disk = None
+    
+    def _get_redis(self):
+        """Return the Redis client when REDIS_URL is set and redis is installed, else None."""
+        if self._redis is None and self.redis_url and REDIS_AVAILABLE:
+            self._redis = redis_asyncio.Redis.from_url(
+                self.redis_url, socket_timeout=1.0, socket_connect_timeout=1.0
+            )
+        return self._redis
+    
+    async def _get_disk(self):
+        """Return the disk cache when ENHANCE_CACHE_DIR is set and diskcache is installed, else None."""
+        if self._disk is None and self.disk_cache_dir and DISKCACHE_AVAILABLE:
+            # diskcache is synchronous SQLite I/O, so opening it (like every get/set) runs in a thread
+            async with self._disk_lock:
+                if self._disk is None and self.disk_cache_dir:
+                    try:
+                        self._disk = await asyncio.to_thread(
+                            diskcache.Cache, self.disk_cache_dir, size_limit=2**30
+                        )
+                    except Exception as e:
+                        logger.warning("Enhancement disk cache unavailable: %s", e)
+                        self.disk_cache_dir = ""
+        return self._disk
+    
+    async def _get_shared(self, cache_key: str) -> str | None:
+        """Look up an enhancement in the disk and Redis tiers; errors degrade to a miss."""
+        disk = await self._get_disk()
+        if disk is not None:
+            try:
+                value = await asyncio.to_thread(disk.get, cache_key)
+            except Exception as e:
+                logger.warning("Enhancement disk cache read failed: %s", e)
+            else:
+                if value is not None:
+                    return value
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            value = await client.get(f"textsense:enh:{cache_key}")
+        except Exception as e:
+            logger.warning("Enhancement cache read failed: %s", e)
+            return None
+        if value is None:
+            return None
+        enhanced = value.decode("utf-8")
+        await self._set_disk(cache_key, enhanced)
+        return enhanced
+    
+    async def _set_disk(self, cache_key: str, enhanced: str) -> None:
+        """Store an enhancement in the disk tier; errors are ignored."""
+        disk = await self._get_disk()
+        if disk is None:
+            return
+        try:
+            await asyncio.to_thread(disk.set, cache_key, enhanced, expire=self.disk_ttl)
+        except Exception as e:
+            logger.warning("Enhancement disk cache write failed: %s", e)
+    
+    async def _set_shared(self, cache_key: str, enhanced: str) -> None:
+        """Store an enhancement in the disk and Redis tiers; errors are ignored."""
+        await self._set_disk(cache_key, enhanced)
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(f"textsense:enh:{cache_key}", enhanced.encode("utf-8"), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning("Enhancement cache write failed: %s", e)
     
     def get_dimensions_for_ratio(self, aspect_ratio: str) -> tuple[int, int]:
         """Map aspect ratio string to width/height dimensions."""
-        ratio = (aspect_ratio or "1:1").strip()
-        
-        dimension_map = {
-            "16:9": (1280, 720),
-            "9:16": (720, 1280),
-            "4:3": (1024, 768),
-            "3:4": (768, 1024),
-            "1:1": (1024, 1024)
-        }
-        
-        return dimension_map.get(ratio, (1024, 1024))
+        return self._DIMENSION_MAP.get((aspect_ratio or "1:1").strip(), (1024, 1024))
     
-    def _contains_nsfw_content(self, text: str) -> bool:
-        """Check if text contains NSFW content using keyword detection."""
-        nsfw_keywords = [
-            # Explicit sexual terms
-            'nude', 'naked', 'sex', 'sexual', 'porn', 'erotic', 'xxx', 'adult',
-            'intimate', 'aroused', 'orgasm', 'masturbat', 'breast', 'nipple',
-            'vagina', 'penis', 'genitals', 'intercourse', 'bdsm', 'fetish',
-            'topless', 'bottomless', 'lingerie', 'underwear', 'bikini',
-            # Suggestive terms
-            'seductive', 'provocative', 'sensual', 'sultry', 'revealing',
-            'cleavage', 'suggestive pose', 'bedroom', 'shower', 'bath',
-            # Violence/disturbing
-            'violence', 'gore', 'blood', 'death', 'kill', 'murder', 'torture',
-            'weapon', 'gun', 'knife', 'violent', 'brutal', 'disturbing'
-        ]
-        
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in nsfw_keywords)
+    def _contains_nsfw_content(self, *texts: str | None) -> bool:
+        """Check if any of the texts contains NSFW content using keyword detection."""
+        search = _NSFW_RE.search
+        return any(search(text) is not None for text in texts if text)
     
-    async def enhance_prompt(self, prompt: str, negative_prompt: str | None = None) -> str:
-        """Enhance the user prompt using AI to improve image generation quality."""
-        # Combine negative prompt textually if provided
+    def _enhance_cache_key(self, combined_prompt: str) -> str:
+        """Cache key covering both the system prompt and the normalized user prompt."""
+        # Only case and whitespace are folded; punctuation and symbols can change meaning ("C++" vs "C#")
+        normalized = " ".join(combined_prompt.casefold().split())
+        # Resume from the pre-hashed system prompt instead of rehashing it per call
+        digest = self._cache_key_base.copy()
+        digest.update(normalized.encode("utf-8"))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _combine_prompts(prompt: str, negative_prompt: str | None) -> str:
+        """Combine negative prompt textually if provided."""
         combined_prompt = prompt.strip()
         neg = (negative_prompt or "").strip()
         if neg:
             combined_prompt = f"{combined_prompt}. avoid: {neg}"
+        return combined_prompt
+    
+    @staticmethod
+    def _looks_enhanced(prompt: str) -> bool:
+        """True for long prompts that already carry at least two distinct enhancer phrases."""
+        if len(prompt) <= _ENHANCED_MIN_LENGTH:
+            return False
+        markers = {m.group().lower() for m in _ENHANCED_MARKERS_RE.finditer(prompt)}
+        return len(markers) >= 2
+    
+    async def enhance_prompt(self, prompt: str, negative_prompt: str | None = None) -> str:
+        """Enhance the user prompt using AI to improve image generation quality."""
+        combined_prompt = self._combine_prompts(prompt, negative_prompt)
         
-        enhanced_prompt = combined_prompt
+        if self._looks_enhanced(combined_prompt):
+            return combined_prompt
         
-        try:
-            payload = {
-                "model": "openai",
-                "messages": [
-                    {"role": "system", "content": self.enhancement_system_prompt},
-                    {"role": "user", "content": f'"{combined_prompt}"'}
-                ]
-            }
-            headers = {"Content-Type": "application/json"}
-            
-            # Add authorization token if available
-            if self.auth_token:
-                headers["Authorization"] = f"Bearer {self.auth_token}"
-            
-            async with httpx.AsyncClient() as client:
+        cache_key = self._enhance_cache_key(combined_prompt)
+        cached = self._enhance_cache.get(cache_key)
+        if cached is None:
+            cached = await self._get_shared(cache_key)
+            if cached is not None:
+                self._enhance_cache[cache_key] = cached
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            return cached
+        self.cache_stats["misses"] += 1
+        if cache_key in self._enhance_failures:
+            return combined_prompt
+        
+        # Join an identical request already in flight (e.g. a prefetch) instead of posting again
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._request_enhancement(combined_prompt, cache_key))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(cache_key, None))
+        # Shield so a cancelled caller does not abort the request other callers share
+        return await asyncio.shield(task)
+    
+    async def _call_enhancer(self, body: bytes) -> httpx.Response:
+        """
+        POST an enhancement request, retrying rate-limit/server statuses and failed connects.
+        
+        Read timeouts are not retried, and a retry only starts inside the retry window, so a
+        stalled upstream costs about one read timeout before the caller falls back. Returns the
+        last response (which may still carry a retryable status) or raises the last error.
+        """
+        client = self._get_client()
+        loop = asyncio.get_running_loop()
+        retry_deadline = loop.time() + self._ENHANCE_RETRY_WINDOW_SECONDS
+        for attempt in range(self._ENHANCE_ATTEMPTS):
+            # Full jitter keeps concurrent retries from hitting the upstream in lockstep
+            delay = random.uniform(
+                0, min(self._ENHANCE_BACKOFF_MAX_SECONDS, self._ENHANCE_BACKOFF_SECONDS * (2 ** attempt))
+            )
+            last_attempt = attempt + 1 == self._ENHANCE_ATTEMPTS
+            try:
                 response = await client.post(
-                    self.text_api_url, 
-                    json=payload, 
-                    headers=headers, 
-                    timeout=30
+                    self.text_api_url, content=body, headers=self._enhance_headers, timeout=self._ENHANCE_TIMEOUT
                 )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # The request never reached the upstream, so retrying it is cheap and safe
+                if last_attempt or loop.time() + delay >= retry_deadline:
+                    raise
+                logger.info("Prompt enhancement attempt %d failed: %s", attempt + 1, e)
+            else:
+                if (
+                    response.status_code not in self._RETRY_STATUSES
+                    or last_attempt
+                    or loop.time() + delay >= retry_deadline
+                ):
+                    return response
+            await asyncio.sleep(delay)
+    
+    async def _request_enhancement(self, combined_prompt: str, cache_key: str) -> str:
+        """Call the enhancement API, caching successes and negative-caching failures."""
+        enhanced_prompt = combined_prompt
+        
+        try:
+            body = (
+                self._enhance_body_prefix
+                + orjson.dumps({"role": "user", "content": f'"{combined_prompt}"'})
+                + b"]}"
+            )
+            response = await self._call_enhancer(body)
             
-                if response.status_code == 200:
-                    data = response.json()
-                    message = (data.get("choices") or [{}])[0].get("message") or {}
-                    content = (message.get("content") or "").strip()
-                    if content:
-                        enhanced_prompt = content
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                message = (data.get("choices") or [{}])[0].get("message") or {}
+                content = (message.get("content") or "").strip()
+                if content:
+                    enhanced_prompt = content
+                    self._enhance_cache[cache_key] = content
+                    await self._set_shared(cache_key, content)
+                    return enhanced_prompt
+            self._enhance_failures[cache_key] = True
                     
         except (httpx.HTTPError, ValueError, KeyError) as e:
             # Fallback to original prompt if enhancement fails
-            print(f"Prompt enhancement failed: {e}")
+            logger.warning("Prompt enhancement failed: %s", e)
             enhanced_prompt = combined_prompt
+            self._enhance_failures[cache_key] = True
         
         return enhanced_prompt
     
+    def prefetch_enhancement(self, prompt: str, negative_prompt: str | None = None) -> bool:
+        """
+        Start enhancing a prompt in the background so a later generate call hits the cache.
+        
+        Returns False when nothing was scheduled (empty or NSFW-flagged prompt).
+        """
+        if not (prompt or "").strip() or self._contains_nsfw_content(prompt, negative_prompt):
+            return False
+        task = asyncio.create_task(self.enhance_prompt(prompt, negative_prompt))
+        # Keep a strong reference until done; the event loop only holds weak ones
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+        return True
+    
+    async def enhance_prompts(
+        self, prompts: list[str], negative_prompt: str | None = None
+    ) -> list[str]:
+        """Enhance several independent prompts concurrently, preserving input order."""
+        return list(await asyncio.gather(
+            *(self.enhance_prompt(prompt, negative_prompt) for prompt in prompts)
+        ))
+    
     def generate_image_urls(
         self, 
         prompt: str, 
@@ -169,24 +454,48 @@ Avoid glamour bias unless explicitly requested.
         model: str = "flux"
     ) -> list[str]:
         """Generate image URLs using Flux model without watermarks."""
-        encoded_prompt = urllib.parse.quote(prompt)
-        images = []
+        # Encode "/" too so it cannot split the prompt path segment
+        encoded_prompt = urllib.parse.quote(prompt, safe="")
+        # Draw all seeds up front; secrets is stdlib, so no per-image import or fallback is needed
+        seeds = [secrets.randbelow(10_000_000) + 1 for _ in range(num_images)]
+        # Everything but the seed is identical across images
+        prefix = (
+            f"{self._image_api_prefix}{encoded_prompt}"
+            f"?model={model}&width={width}&height={height}&nologo=true&seed="
+        )
+        return [prefix + str(seed) for seed in seeds]
+    
+    async def fetch_images(self, urls: list[str]) -> list[bytes | None]:
+        """
+        Download generated images concurrently.
         
-        for _ in range(num_images):
-            # Use secrets for better randomness if available, fallback to random
-            try:
-                import secrets
-                seed = secrets.randbelow(10_000_000) + 1
-            except ImportError:
-                seed = random.randint(1, 10_000_000)
-            
-            url = (
-                f"{self.image_api_base.rstrip('/')}/prompt/{encoded_prompt}"
-                f"?model={model}&width={width}&height={height}&seed={seed}&nologo=true"
-            )
-            images.append(url)
+        Each URL triggers its own render upstream, so fetching them together costs roughly
+        the slowest render instead of the sum. Rate-limit and server errors are retried with
+        exponential backoff; downloads that still fail come back as None.
+        """
+        client = self._get_client()
+        
+        async def fetch_one(url: str) -> bytes | None:
+            for attempt in range(self._FETCH_ATTEMPTS):
+                try:
+                    response = await client.get(url)
+                    if response.status_code not in self._RETRY_STATUSES:
+                        response.raise_for_status()
+                        return response.content
+                    error: Exception = httpx.HTTPStatusError(
+                        f"HTTP {response.status_code}", request=response.request, response=response
+                    )
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    error = e
+                except httpx.HTTPError as e:
+                    logger.warning("Image fetch failed: %s", e)
+                    return None
+                if attempt + 1 < self._FETCH_ATTEMPTS:
+                    await asyncio.sleep(self._FETCH_BACKOFF_SECONDS * (2 ** attempt))
+            logger.warning("Image fetch failed after %d attempts: %s", self._FETCH_ATTEMPTS, error)
+            return None
         
-        return images
+        return list(await asyncio.gather(*(fetch_one(url) for url in urls)))
     
     async def generate_images(
         self,
@@ -213,34 +522,35 @@ Avoid glamour bias unless explicitly requested.
         Returns:
             Dictionary containing image URLs and metadata
         """
+        # Normalize every user string once; helpers' own strip() calls are then no-ops
+        prompt = (prompt or "").strip()
+        negative_prompt = (negative_prompt or "").strip()
+        aspect_ratio = (aspect_ratio or "1:1").strip()
+        
         # Validate inputs
-        if not prompt or not prompt.strip():
+        if not prompt:
             raise ValueError("Prompt is required")
         
         if num_images < 1 or num_images > 4:
             raise ValueError("Number of images must be between 1 and 4")
         
+        if not self.image_api_base:
+            raise RuntimeError("Image generation is not configured (FLUX_IMAGE_BASE is not set)")
+        
         # Safety check for NSFW content
         if enable_safety_checker:
-            combined_check_text = prompt
-            if negative_prompt:
-                combined_check_text += " " + negative_prompt
-            
-            if self._contains_nsfw_content(combined_check_text):
+            if self._contains_nsfw_content(prompt, negative_prompt):
                 raise ValueError("Content violates safety guidelines. Please modify your prompt to avoid NSFW content.")
         
         # Get dimensions for aspect ratio
         width, height = self.get_dimensions_for_ratio(aspect_ratio)
         
         # Enhance prompt if requested
-        final_prompt = prompt.strip()
         if enhance_prompt:
             final_prompt = await self.enhance_prompt(prompt, negative_prompt)
-        elif negative_prompt:
+        else:
             # If not enhancing, still combine negative prompt
-            neg = negative_prompt.strip()
-            if neg:
-                final_prompt = f"{prompt.strip()}. avoid: {neg}"
+            final_prompt = self._combine_prompts(prompt, negative_prompt)
         
         # Generate image URLs
         image_urls = self.generate_image_urls(
@@ -254,7 +564,7 @@ Avoid glamour bias unless explicitly requested.
         return {
             "images": image_urls,
             "enhanced_prompt": final_prompt if enhance_prompt else None,
-            "original_prompt": prompt.strip(),
+            "original_prompt": prompt,
             "prompt_enhanced": enhance_prompt,
             "safety_enabled": enable_safety_checker,
             "provider": "flux",
@@ -266,5 +576,7 @@ Avoid glamour bias unless explicitly requested.
         }
 
 
-# Convenience instance for easy importing
-image_generator = ImageGenerator()
+@functools.cache
+def get_image_generator() -> ImageGenerator:
+    """Return the shared generator, reading its configuration on first use rather than at import."""
+    return ImageGenerator()
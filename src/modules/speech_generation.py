@@ -28,6 +28,25 @@ class SpeechGenerator:
         else:
             logger.warning("POLLINATIONS_API_KEY not set - API may require authentication")
 
+        # Shared pooled client, created lazily on first use
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP/2 client so keep-alive connections and TLS sessions are reused."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled client (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     def _construct_prompt(self, text: str, vibe: str = "") -> str:
         """Construct the full prompt with vibe context."""
         sanitized_text = text.strip()
@@ -148,44 +167,44 @@ class SpeechGenerator:
 
                 headers = self._get_headers()
 
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    response = await client.post(api_url, json=payload, headers=headers)
-                    logger.info(f"Response status: {response.status_code}")
-
-                    if response.status_code == 200:
-                        response_data = response.json()
-                        try:
-                            # Extract base64 audio data from response
-                            audio_b64 = response_data['choices'][0]['message']['audio']['data']
-                            audio_bytes = base64.b64decode(audio_b64)
-
-                            if len(audio_bytes) == 0:
-                                last_error = "Empty audio data in response"
-                                continue
-
-                            # Return as streaming response
-                            async def stream_audio():
-                                yield audio_bytes
-
-                            return StreamingResponse(
-                                stream_audio(),
-                                media_type="audio/mpeg",
-                                headers={
-                                    "Content-Disposition": "attachment; filename=generated_speech.mp3",
-                                    "Cache-Control": "no-cache",
-                                    "X-Speech-Provider": "pollinations",
-                                    "X-Speech-Voice": voice,
-                                    "X-Speech-Vibe": vibe or ""
-                                }
-                            )
-                        except KeyError as e:
-                            last_error = f"Missing expected field in response: {e}. Response: {response_data}"
-                            logger.warning(f"Response structure: {response_data}")
+                client = self._get_client()
+                response = await client.post(api_url, json=payload, headers=headers)
+                logger.info(f"Response status: {response.status_code}")
+
+                if response.status_code == 200:
+                    response_data = response.json()
+                    try:
+                        # Extract base64 audio data from response
+                        audio_b64 = response_data['choices'][0]['message']['audio']['data']
+                        audio_bytes = base64.b64decode(audio_b64)
+
+                        if len(audio_bytes) == 0:
+                            last_error = "Empty audio data in response"
                             continue
 
-                    can_retry, error_message = self._handle_api_error(response)
-                    last_error = error_message or f"API error: {response.text}"
-                    logger.error(f"API error: {last_error}")
+                        # Return as streaming response
+                        async def stream_audio():
+                            yield audio_bytes
+
+                        return StreamingResponse(
+                            stream_audio(),
+                            media_type="audio/mpeg",
+                            headers={
+                                "Content-Disposition": "attachment; filename=generated_speech.mp3",
+                                "Cache-Control": "no-cache",
+                                "X-Speech-Provider": "pollinations",
+                                "X-Speech-Voice": voice,
+                                "X-Speech-Vibe": vibe or ""
+                            }
+                        )
+                    except KeyError as e:
+                        last_error = f"Missing expected field in response: {e}. Response: {response_data}"
+                        logger.warning(f"Response structure: {response_data}")
+                        continue
+
+                can_retry, error_message = self._handle_api_error(response)
+                last_error = error_message or f"API error: {response.text}"
+                logger.error(f"API error: {last_error}")
 
                 if attempt == max_retries - 1:
                     logger.error(f"All retries exhausted. Last error: {last_error}")
@@ -41,14 +41,42 @@ except ImportError:
     NLTK_AVAILABLE = False
     logger.warning("NLTK not available. Some features will be limited.")
 
+# Cleanup patterns used on every humanization request, compiled once
+_WORD_RE = re.compile(r'\b\w+\b')
+# Collapses whitespace runs and drops them entirely before punctuation in one pass
+_SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+([,.!?;:])?')
+_PUNCT_THEN_CAPITAL_RE = re.compile(r'([,.!?;:])\s*([A-Z])')
+_SENTENCE_BOUNDARY_RE = re.compile(r'([.!?]+(?:\s+|$))')
+_SENTENCE_END_RE = re.compile(r'[.!?]+\s*$')
+_REPEATED_PERIODS_RE = re.compile(r'\.+')
+
+
 class AdvancedAIHumanizer:
     def __init__(self):
         self.api_key = os.getenv("POLLINATIONS_API_KEY", "").strip()
+        # Shared pooled client, created lazily on first use
+        self._client = None
         self.setup_humanization_patterns()
         self.setup_fallback_embeddings()
         if NLTK_AVAILABLE:
             self.load_linguistic_resources()
             
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP/2 client so keep-alive connections and TLS sessions are reused."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled client (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     def setup_fallback_embeddings(self):
         """Setup fallback word similarity using simple patterns"""
         # Note: Currently unused but kept for potential future synonym replacement features
@@ -119,6 +147,13 @@ class AdvancedAIHumanizer:
             r'\bin terms of\b': ["regarding", "when it comes to", "as for", "concerning", "about"],
         }
 
+        # Fuse every indicator into one alternation so the text is scanned once; lastgroup names the hit
+        self._ai_replacements = list(self.ai_indicators.values())
+        self._ai_indicator_re = re.compile(
+            "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(self.ai_indicators)),
+            re.IGNORECASE,
+        )
+
         # More natural sentence starters
         self.human_starters = [
             "Actually,", "Honestly,", "Basically,", "Really,", "Generally,", "Usually,",
@@ -144,6 +179,12 @@ class AdvancedAIHumanizer:
             r'\bthey will\b': "they'll", r'\bI would\b': "I'd", r'\byou would\b': "you'd"
         }
 
+        # Compiled once; each contraction is applied with a single scan when drawn
+        self._contraction_subs = [
+            (re.compile(pattern, re.IGNORECASE), contraction)
+            for pattern, contraction in self.contractions.items()
+        ]
+
     def load_linguistic_resources(self):
         """Load additional linguistic resources"""
         try:
@@ -194,14 +235,13 @@ class AdvancedAIHumanizer:
                 logger.warning("Pollinations API key not available, skipping API call")
                 return text
 
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(url, headers=headers)
+            response = await self._get_client().get(url, headers=headers)
 
-                if response.status_code == 200:
-                    return response.text.strip()
-                else:
-                    logger.warning(f"Pollinations API failed with status {response.status_code}: {response.text}")
-                    return text
+            if response.status_code == 200:
+                return response.text.strip()
+            else:
+                logger.warning(f"Pollinations API failed with status {response.status_code}: {response.text}")
+                return text
         except Exception as e:
             logger.error(f"Pollinations API error: {e}")
             return text
@@ -254,29 +294,27 @@ class AdvancedAIHumanizer:
 
     def replace_ai_patterns(self, text: str, intensity: int = 2) -> str:
         """Replace AI-flagged patterns aggressively"""
-        result = text
         replacement_probability = {1: 0.7, 2: 0.85, 3: 0.95}
         prob = replacement_probability.get(intensity, 0.85)
+        replacements = self._ai_replacements
         
-        # Use re.sub() directly for better performance with large texts
-        for pattern, replacements in self.ai_indicators.items():
-            def replace_func(match):
-                if random.random() < prob:
-                    return random.choice(replacements)
-                return match.group(0)  # Return original if probability check fails
-            
-            result = re.sub(pattern, replace_func, result, flags=re.IGNORECASE)
+        def replace_func(match):
+            if random.random() < prob:
+                return random.choice(replacements[int(match.lastgroup[1:])])
+            return match.group(0)  # Return original if probability check fails
         
-        return result
+        # Single pass over the text for all indicators
+        return self._ai_indicator_re.sub(replace_func, text)
 
     def apply_advanced_contractions(self, text: str, intensity: int = 2) -> str:
         """Apply natural contractions"""
         contraction_probability = {1: 0.4, 2: 0.6, 3: 0.8}
         prob = contraction_probability.get(intensity, 0.6)
         
-        for pattern, contraction in self.contractions.items():
-            if re.search(pattern, text, re.IGNORECASE) and random.random() < prob:
-                text = re.sub(pattern, contraction, text, flags=re.IGNORECASE)
+        # Drawing first skips unselected patterns outright; sub() on a non-matching text is a plain scan
+        for pattern, contraction in self._contraction_subs:
+            if random.random() < prob:
+                text = pattern.sub(contraction, text)
         
         return text
 
@@ -330,8 +368,8 @@ class AdvancedAIHumanizer:
                 return min(1.0, jaccard * 1.2)  # Slight boost for humanization
             else:
                 # Simple word overlap without NLTK
-                orig_words = set(re.findall(r'\b\w+\b', original.lower()))
-                proc_words = set(re.findall(r'\b\w+\b', processed.lower()))
+                orig_words = set(_WORD_RE.findall(original.lower()))
+                proc_words = set(_WORD_RE.findall(processed.lower()))
                 
                 if not orig_words or not proc_words:
                     return 0.0
@@ -372,7 +410,7 @@ class AdvancedAIHumanizer:
                 return max(30.0, min(100.0, perplexity * 1.5))
             else:
                 # Fallback: estimate based on vocabulary diversity
-                words = re.findall(r'\b\w+\b', text.lower())
+                words = _WORD_RE.findall(text.lower())
                 if len(words) < 2:
                     return 50.0
                 
@@ -459,9 +497,8 @@ class AdvancedAIHumanizer:
         # Low metrics indicate the text may need more humanization, which is valuable feedback
         
         # Final cleanup
-        processed = re.sub(r'\s+', ' ', processed)
-        processed = re.sub(r'\s+([,.!?;:])', r'\1', processed)
-        processed = re.sub(r'([,.!?;:])\s*([A-Z])', r'\1 \2', processed)
+        processed = _SPACE_BEFORE_PUNCT_RE.sub(lambda m: m.group(1) or ' ', processed)
+        processed = _PUNCT_THEN_CAPITAL_RE.sub(r'\1 \2', processed)
         
         # Ensure proper capitalization
         if NLTK_AVAILABLE:
@@ -470,15 +507,14 @@ class AdvancedAIHumanizer:
             # Split on sentence endings while preserving punctuation
             # This regex finds sentence boundaries (period, exclamation, question mark)
             # followed by whitespace or end of string
-            sentence_pattern = r'([.!?]+(?:\s+|$))'
-            parts = re.split(sentence_pattern, processed)
+            parts = _SENTENCE_BOUNDARY_RE.split(processed)
             sentences = []
             current = ""
             for part in parts:
                 if part.strip():
                     current += part
                     # If this part ends with punctuation, it's a complete sentence
-                    if re.search(r'[.!?]+\s*$', part):
+                    if _SENTENCE_END_RE.search(part):
                         sentences.append(current.strip())
                         current = ""
             # Add any remaining text
@@ -496,7 +532,7 @@ class AdvancedAIHumanizer:
         
         # Join with space, but preserve original spacing around punctuation
         processed = " ".join(corrected)
-        processed = re.sub(r'\.+', '.', processed)
+        processed = _REPEATED_PERIODS_RE.sub('.', processed)
         processed = processed.strip()
         
         return processed, metrics
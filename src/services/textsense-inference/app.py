@@ -1,18 +1,63 @@
 import os
+import fcntl
+import logging
 import re
-from typing import List, Tuple
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
+# Size BLAS/OpenMP pools before torch is imported; one core is left for the event loop
+try:
+    _AVAILABLE_CORES = len(os.sched_getaffinity(0))
+except AttributeError:
+    _AVAILABLE_CORES = os.cpu_count() or 1
+CPU_THREADS = int(os.getenv("TEXTSENSE_CPU_THREADS", str(max(1, _AVAILABLE_CORES - 1))))
+os.environ.setdefault("OMP_NUM_THREADS", str(CPU_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(CPU_THREADS))
+
+import numpy as np
 import torch
 import torch.nn as nn
 from transformers import AutoTokenizer, AutoConfig, AutoModel, PreTrainedModel
 from fastapi import FastAPI, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+
+from tokenization import slice_span_ids
+
+# ONNX Runtime is optional; without it CPU inference stays on the PyTorch path
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
 
 
+_LOG_LEVEL_NAME = os.getenv("LOG_LEVEL", "INFO").upper()
+# getLevelName maps known names to their numeric level and anything else to a "Level x" string
+_LOG_LEVEL = logging.getLevelName(_LOG_LEVEL_NAME)
+logging.basicConfig(level=_LOG_LEVEL if isinstance(_LOG_LEVEL, int) else logging.INFO)
+logger = logging.getLogger(__name__)
+if not isinstance(_LOG_LEVEL, int):
+    logger.warning("Unknown LOG_LEVEL %r, using INFO", _LOG_LEVEL_NAME)
+
 MODEL_ID = os.getenv("MODEL_ID", "desklib/ai-text-detector-v1.01")
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 DEFAULT_MAX_LEN = int(os.getenv("MAX_LEN", "256"))
 DEFAULT_BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))
+USE_ONNX = os.getenv("USE_ONNX", "true").lower() == "true"
+USE_TORCH_COMPILE = os.getenv("USE_TORCH_COMPILE", "true").lower() == "true"
+# Compiled graphs are specialized per shape; pad sequence lengths to a few fixed buckets
+SEQ_PAD_MULTIPLE = 64
+MODEL_COMPILED = False  # Set by load_model when torch.compile succeeds
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "20000"))
+# Inputs shorter than this are scored as one segment without sentence splitting
+SHORT_TEXT_CHARS = 32
+
+# Pin intra-op threads to the sized pool; a single inter-op thread avoids oversubscription
+torch.set_num_threads(CPU_THREADS)
+torch.set_num_interop_threads(1)
 
 # Use /tmp for model cache (always writable in containers)
 HF_CACHE_DIR = "/tmp/hf"
@@ -21,6 +66,10 @@ os.makedirs(HF_CACHE_DIR, exist_ok=True)
 # Set HF_HOME for modern transformers (deprecated TRANSFORMERS_CACHE removed)
 os.environ.setdefault("HF_HOME", HF_CACHE_DIR)
 os.environ.setdefault("HUGGINGFACE_HUB_CACHE", HF_CACHE_DIR)
+ONNX_DIR = os.path.join(HF_CACHE_DIR, "onnx", MODEL_ID.replace("/", "--"))
+# Prebuilt INT8 model (e.g. baked into the image); skips export and quantization at startup.
+# Unset, the model is built under ONNX_DIR and named after the checkpoint revision.
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH")
 
 
 class DesklibAIDetectionModel(PreTrainedModel):
@@ -45,70 +94,330 @@ class DesklibAIDetectionModel(PreTrainedModel):
         sum_embeddings = torch.sum(last_hidden_state * input_mask_expanded, dim=1)
         sum_mask = torch.clamp(input_mask_expanded.sum(dim=1), min=1e-9)
         pooled_output = sum_embeddings / sum_mask
-        logits = self.classifier(pooled_output)
+        # Pooling runs in fp32; match the head's dtype when weights are half precision
+        logits = self.classifier(pooled_output.to(self.classifier.weight.dtype))
         return {"logits": logits}
 
 
 def load_model():
+    global MODEL_COMPILED
     # Try fast tokenizer first, fall back to slow tokenizer if there's a compatibility issue
     try:
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, cache_dir=HF_CACHE_DIR, use_fast=True)
+        tokenizer = AutoTokenizer.from_pretrained(
+            MODEL_ID, cache_dir=HF_CACHE_DIR, use_fast=True, truncation_side="right"
+        )
     except Exception as e:
-        print(f"Warning: Fast tokenizer failed ({e}), falling back to slow tokenizer")
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, cache_dir=HF_CACHE_DIR, use_fast=False)
-    model = DesklibAIDetectionModel.from_pretrained(MODEL_ID, cache_dir=HF_CACHE_DIR)
+        logger.warning("Fast tokenizer failed (%s), falling back to slow tokenizer", e)
+        tokenizer = AutoTokenizer.from_pretrained(
+            MODEL_ID, cache_dir=HF_CACHE_DIR, use_fast=False, truncation_side="right"
+        )
+    if not tokenizer.is_fast:
+        # The Rust tokenizer is 10-50x faster and required for single-pass offset tokenization
+        logger.warning("Using slow Python tokenizer; install a compatible 'tokenizers' build for the fast path")
+    # Build the skeleton on the meta device and load checkpoint tensors straight in, instead of
+    # randomly initializing a full model that from_pretrained immediately overwrites
+    try:
+        model = DesklibAIDetectionModel.from_pretrained(
+            MODEL_ID, cache_dir=HF_CACHE_DIR, low_cpu_mem_usage=True
+        )
+    except ImportError as e:
+        # low_cpu_mem_usage requires accelerate
+        logger.warning("Low-memory loading unavailable (%s), falling back to regular loading", e)
+        model = DesklibAIDetectionModel.from_pretrained(MODEL_ID, cache_dir=HF_CACHE_DIR)
     model.to(DEVICE)
+    if DEVICE.type == "cuda":
+        # Native half-precision weights halve weight bandwidth (bf16 on Ampere+, fp16 otherwise)
+        model.to(torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16)
     model.eval()
 
-    # Warmup
-    with torch.no_grad():
-        sample = tokenizer("Hello.", truncation=True, max_length=8, return_tensors="pt")
-        input_ids = sample["input_ids"].to(DEVICE)
-        attention_mask = sample["attention_mask"].to(DEVICE)
-        if DEVICE.type == "cuda":
-            with torch.cuda.amp.autocast():
-                _ = model(input_ids=input_ids, attention_mask=attention_mask)
-        else:
-            _ = model(input_ids=input_ids, attention_mask=attention_mask)
+    # Warmup at the steady-state batch shape so allocator pools and GEMM kernel choices
+    # are settled before the first real request
+    dummy_ids = torch.full(
+        (DEFAULT_BATCH_SIZE, DEFAULT_MAX_LEN), tokenizer.pad_token_id or 0, dtype=torch.long, device=DEVICE
+    )
+    dummy_mask = torch.ones_like(dummy_ids)
+    with torch.inference_mode():
+        for _ in range(2 if DEVICE.type == "cuda" else 1):
+            _ = model(input_ids=dummy_ids, attention_mask=dummy_mask)
+
+    # Compile for CUDA (torch>=2.0) so Inductor fuses pooling/head ops and captures CUDA graphs
+    if DEVICE.type == "cuda" and USE_TORCH_COMPILE and hasattr(torch, "compile"):
+        eager_model = model
+        try:
+            model = torch.compile(model, mode="reduce-overhead", dynamic=False)
+            # The third call is the first one that replays the captured graph
+            with torch.inference_mode():
+                for _ in range(3):
+                    _ = model(input_ids=dummy_ids, attention_mask=dummy_mask)
+            MODEL_COMPILED = True
+        except Exception as e:
+            logger.warning("torch.compile failed (%s), using eager model", e)
+            model = eager_model
 
     return tokenizer, model
 
 
+def load_onnx_session(model):
+    """Open a CPU session on the INT8 model, exporting and quantizing it first if not yet built."""
+    int8_path = ONNX_MODEL_PATH
+    if not int8_path:
+        # ONNX_DIR is already per MODEL_ID; the revision keeps an updated checkpoint from reusing a stale export
+        revision = getattr(model.config, "_commit_hash", None) or "local"
+        int8_path = os.path.join(ONNX_DIR, f"model.{revision}.int8.onnx")
+    if not os.path.exists(int8_path):
+        export_onnx_model(model, int8_path)
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.enable_cpu_mem_arena = False
+    options.intra_op_num_threads = CPU_THREADS
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(int8_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def export_onnx_model(model, int8_path: str):
+    """
+    Export the model to ONNX and quantize weights to INT8 at int8_path.
+    
+    Workers booting together serialize on a lock file: the first one builds the model and the
+    others reuse it. Working files get per-process names and the result is renamed into place,
+    so neither a crash nor a peer can leave or consume a partial artifact.
+    """
+    out_dir = os.path.dirname(int8_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    with open(int8_path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(int8_path):
+            return
+        fd, fp32_path = tempfile.mkstemp(suffix=".onnx", dir=out_dir)
+        os.close(fd)
+        fd, tmp_path = tempfile.mkstemp(suffix=".int8.onnx.tmp", dir=out_dir)
+        os.close(fd)
+        try:
+            dummy_ids = torch.ones((1, 8), dtype=torch.long)
+            dummy_mask = torch.ones((1, 8), dtype=torch.long)
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    (dummy_ids, dummy_mask),
+                    fp32_path,
+                    input_names=["input_ids", "attention_mask"],
+                    output_names=["logits"],
+                    dynamic_axes={
+                        "input_ids": {0: "batch", 1: "seq"},
+                        "attention_mask": {0: "batch", 1: "seq"},
+                        "logits": {0: "batch"},
+                    },
+                    opset_version=14,
+                )
+            quantize_dynamic(model_input=fp32_path, model_output=tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        finally:
+            for path in (fp32_path, tmp_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
 tokenizer, model = load_model()
 
-app = FastAPI(title="TextSense Inference (GPU)")
+# INT8 ONNX Runtime session for CPU inference; None keeps the PyTorch path
+onnx_session = None
+if DEVICE.type == "cpu" and USE_ONNX and ONNX_AVAILABLE:
+    try:
+        onnx_session = load_onnx_session(model)
+    except Exception as e:
+        logger.warning("ONNX Runtime session failed (%s), falling back to PyTorch inference", e)
+        onnx_session = None
+
+app = FastAPI(title="TextSense Inference (GPU)", default_response_class=ORJSONResponse)
+
+
+# Compiled once at import instead of on every request
+# Runs of spaces and single newlines collapse to one space in a single pass; paragraph breaks survive
+_NORMALIZE_RE = re.compile(r"(?: |(?<!\n)\n(?!\n))+")
+_SENTENCE_RE = re.compile(r"[^.!?]*[.!?]+(?:\s+|$)")
 
 
 def simple_sentence_split(text: str) -> List[Tuple[str, int, int]]:
-    pattern = r"[^.!?]*[.!?]+(?:\s+|$)"
-    matches = list(re.finditer(pattern, text))
     spans: List[Tuple[str, int, int]] = []
     last_end = 0
-    for m in matches:
-        seg = m.group().strip()
+    # One regex scan; each match is trimmed with a single lstrip/rstrip pair at C level
+    for m in _SENTENCE_RE.finditer(text):
+        raw = m.group()
+        head = raw.lstrip()
+        seg = head.rstrip()
         if not seg:
             last_end = m.end()
             continue
-        raw_start = m.start()
-        raw_end = m.end()
-        trim_left = 0
-        trim_right = 0
-        while raw_start + trim_left < raw_end and text[raw_start + trim_left].isspace():
-            trim_left += 1
-        while raw_end - 1 - trim_right >= raw_start + trim_left and text[raw_end - 1 - trim_right].isspace():
-            trim_right += 1
-        sentence_start = raw_start + trim_left
-        sentence_end = raw_end - trim_right
+        sentence_start = m.start() + (len(raw) - len(head))
+        sentence_end = sentence_start + len(seg)
         spans.append((seg, sentence_start, sentence_end))
         last_end = sentence_end
     if last_end < len(text):
-        trailing = text[last_end:].strip()
-        if trailing:
-            spans.append((trailing, last_end, len(text)))
+        tail = text[last_end:]
+        trailing = tail.lstrip()
+        if trailing.strip():
+            trailing_start = last_end + (len(tail) - len(trailing))
+            trailing = trailing.rstrip()
+            spans.append((trailing, trailing_start, trailing_start + len(trailing)))
     return spans
 
 
-def predict_texts_batch(texts: List[str], max_len: int = DEFAULT_MAX_LEN, batch_size: int = DEFAULT_BATCH_SIZE):
+def _run_session(input_ids_np: np.ndarray, attn_np: np.ndarray) -> np.ndarray:
+    """Run the quantized ONNX session and return raw logits."""
+    return onnx_session.run(
+        ["logits"],
+        {"input_ids": input_ids_np.astype(np.int64), "attention_mask": attn_np.astype(np.int64)},
+    )[0]
+
+
+# Side stream for host-to-device copies so batch N+1 uploads while batch N computes
+_copy_stream = torch.cuda.Stream() if DEVICE.type == "cuda" else None
+
+
+def _copy_to_device_async(enc):
+    """Queue pinned host-to-device copies on the copy stream; returns tensors and a ready event."""
+    with torch.cuda.stream(_copy_stream):
+        input_ids = enc["input_ids"].pin_memory().to(DEVICE, non_blocking=True)
+        attention_mask = enc["attention_mask"].pin_memory().to(DEVICE, non_blocking=True)
+        ready = torch.cuda.Event()
+        ready.record(_copy_stream)
+    return input_ids, attention_mask, ready
+
+
+def _forward_logits(input_ids: torch.Tensor, attention_mask: torch.Tensor, batch_size: int) -> torch.Tensor:
+    """Run the PyTorch model on device tensors and return logits for the real rows."""
+    n_real = input_ids.size(0)
+    if MODEL_COMPILED and n_real < batch_size:
+        # Pad the short last batch so the compiled graph is reused, not recompiled
+        pad_rows = batch_size - n_real
+        input_ids = torch.nn.functional.pad(input_ids, (0, 0, 0, pad_rows))
+        attention_mask = torch.nn.functional.pad(attention_mask, (0, 0, 0, pad_rows))
+    outputs = model(input_ids=input_ids, attention_mask=attention_mask)
+    return outputs["logits"].squeeze(-1)[:n_real]
+
+
+# LRU of model probabilities keyed by (max_len, sliced, blake2b(text)); thresholds are applied on read.
+# Ids sliced from a full-text tokenization can differ from tokenizing the span alone, so the two
+# sources never share an entry.
+_prediction_cache: "OrderedDict[Tuple[int, bool, bytes], float]" = OrderedDict()
+
+
+def _cache_key(text: str, max_len: int, sliced: bool = False) -> Tuple[int, bool, bytes]:
+    return max_len, sliced, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def pretokenize_spans(text: str, spans: List[Tuple[str, int, int]], max_len: int = DEFAULT_MAX_LEN) -> Optional[List[List[int]]]:
+    """
+    Tokenize the full text once and slice per-span model inputs from the offset mapping.
+    
+    Returns None when the tokenizer has no offset support (slow tokenizer) or a span
+    yields no tokens, in which case callers tokenize each span separately.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        return None
+    try:
+        return slice_span_ids(tokenizer, text, spans, max_len)
+    except Exception as e:
+        logger.error("Error tokenizing text: %s", e)
+        return None
+
+
+def _predict_probabilities(
+    texts: List[str],
+    max_len: int,
+    batch_size: int,
+    token_ids: Optional[List[List[int]]] = None,
+) -> List[Optional[float]]:
+    """Run the model over texts (or their pre-built token ids); None marks entries whose batch failed."""
+    total = len(texts)
+    results: List[Optional[float]] = [None] * total
+    
+    if token_ids is not None:
+        # Already tokenized by pretokenize_spans; skip the tokenizer entirely
+        encoded = {"input_ids": token_ids, "attention_mask": [[1] * len(ids) for ids in token_ids]}
+    else:
+        # Filter out empty texts
+        texts = [t if t.strip() else " " for t in texts]
+        
+        try:
+            # Tokenize once without padding so batches can be formed from similar lengths
+            encoded = tokenizer(texts, padding=False, truncation=True, max_length=max_len)
+        except Exception as e:
+            logger.error("Error tokenizing texts: %s", e)
+            return results
+    
+    # Bucket by token count: each batch pads only to its own (similar) longest sample
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    order = np.argsort(lengths, kind="stable")
+    
+    # Pad every bucket up front so device copies can run ahead of compute
+    batches = []
+    for start_idx in range(0, total, batch_size):
+        batch_idx = order[start_idx:start_idx + batch_size].tolist()
+        try:
+            enc = tokenizer.pad(
+                {
+                    "input_ids": [encoded["input_ids"][i] for i in batch_idx],
+                    "attention_mask": [encoded["attention_mask"][i] for i in batch_idx],
+                },
+                pad_to_multiple_of=SEQ_PAD_MULTIPLE if MODEL_COMPILED else None,
+                return_tensors="pt"
+            )
+            batches.append((batch_idx, enc))
+        except Exception as e:
+            logger.error("Error padding batch: %s", e)
+    
+    use_copy_stream = _copy_stream is not None and onnx_session is None
+    # Probabilities accumulate where they are computed; NaN marks batches that failed
+    probs_device = torch.device("cpu") if onnx_session is not None else DEVICE
+    with torch.inference_mode():
+        all_probs = torch.full((total,), float("nan"), dtype=torch.float32, device=probs_device)
+        next_inputs = None
+        for n, (batch_idx, enc) in enumerate(batches):
+            try:
+                if onnx_session is not None:
+                    logits = torch.from_numpy(
+                        _run_session(enc["input_ids"].numpy(), enc["attention_mask"].numpy())
+                    ).squeeze(-1)
+                elif use_copy_stream:
+                    input_ids, attention_mask, ready = next_inputs or _copy_to_device_async(enc)
+                    # Queue the next batch's upload before this batch's forward
+                    next_inputs = _copy_to_device_async(batches[n + 1][1]) if n + 1 < len(batches) else None
+                    compute_stream = torch.cuda.current_stream()
+                    compute_stream.wait_event(ready)
+                    input_ids.record_stream(compute_stream)
+                    attention_mask.record_stream(compute_stream)
+                    logits = _forward_logits(input_ids, attention_mask, batch_size)
+                else:
+                    logits = _forward_logits(enc["input_ids"].to(DEVICE), enc["attention_mask"].to(DEVICE), batch_size)
+                # Upcast before sigmoid to avoid half-precision range issues
+                all_probs[torch.as_tensor(batch_idx, device=probs_device)] = torch.sigmoid(logits.float())
+            except Exception as e:
+                # If batch fails, leave its entries unset (neutral to the caller)
+                # This prevents one bad input from breaking the entire request
+                # Log error for debugging (in production, use proper logging)
+                logger.error("Error processing batch: %s", e)
+                next_inputs = None
+        
+        # One device-to-host sync for the whole request
+        try:
+            # Ensure probability is in valid range [0, 1]
+            probs_np = all_probs.clamp(0.0, 1.0).cpu().numpy()
+        except Exception as e:
+            logger.error("Error collecting predictions: %s", e)
+            return results
+    
+    return [None if np.isnan(p) else p for p in probs_np.tolist()]
+
+
+def predict_texts_batch(
+    texts: List[str],
+    max_len: int = DEFAULT_MAX_LEN,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    threshold: float = 0.5,
+    token_ids: Optional[List[List[int]]] = None,
+):
     """
     Predict AI probability for a batch of texts.
     
@@ -116,119 +425,116 @@ def predict_texts_batch(texts: List[str], max_len: int = DEFAULT_MAX_LEN, batch_
         texts: List of text strings to predict
         max_len: Maximum sequence length for tokenization
         batch_size: Number of texts to process per batch
+        threshold: Probability at or above which a text is labelled AI
+        token_ids: Optional model inputs aligned with texts (see pretokenize_spans)
         
     Returns:
         List of tuples (probability, label) where label is 1 for AI, 0 for human
     """
-    results: List[Tuple[float, int]] = []
-    total = len(texts)
-    if total == 0:
-        return results
-    
-    with torch.no_grad():
-        for start_idx in range(0, total, batch_size):
-            end_idx = min(start_idx + batch_size, total)
-            batch_texts = texts[start_idx:end_idx]
-            
-            # Filter out empty texts
-            batch_texts = [t if t.strip() else " " for t in batch_texts]
-            
-            try:
-                enc = tokenizer(
-                    batch_texts,
-                    padding=True,
-                    truncation=True,
-                    max_length=max_len,
-                    return_tensors="pt"
-                )
-                input_ids = enc["input_ids"].to(DEVICE)
-                attention_mask = enc["attention_mask"].to(DEVICE)
-                
-                if DEVICE.type == "cuda":
-                    with torch.cuda.amp.autocast():
-                        outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-                else:
-                    outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-                
-                logits = outputs["logits"].squeeze(-1)
-                probs = torch.sigmoid(logits).detach().cpu().tolist()
-                
-                # Handle single vs batch outputs
-                if isinstance(probs, float):
-                    probs = [probs]
-                
-                for p in probs:
-                    # Ensure probability is in valid range [0, 1]
-                    prob = max(0.0, min(1.0, float(p)))
-                    results.append((prob, 1 if prob >= 0.5 else 0))
-            except Exception as e:
-                # If batch fails, return default predictions (neutral)
-                # This prevents one bad input from breaking the entire request
-                for _ in batch_texts:
-                    results.append((0.5, 0))
-                # Log error for debugging (in production, use proper logging)
-                print(f"Error processing batch: {e}")
+    if not texts:
+        return []
+    
+    keys = [_cache_key(t, max_len, token_ids is not None) for t in texts]
+    probs: List[Optional[float]] = []
+    for key in keys:
+        prob = _prediction_cache.get(key)
+        if prob is not None:
+            _prediction_cache.move_to_end(key)
+        probs.append(prob)
     
-    return results
+    # Only forward the texts that are not cached, once per distinct text
+    misses: Dict[Tuple[int, bool, bytes], List[int]] = {}
+    for i, p in enumerate(probs):
+        if p is None:
+            misses.setdefault(keys[i], []).append(i)
+    if misses:
+        first = [idxs[0] for idxs in misses.values()]
+        miss_token_ids = [token_ids[i] for i in first] if token_ids is not None else None
+        fresh = _predict_probabilities([texts[i] for i in first], max_len, batch_size, miss_token_ids)
+        for (key, idxs), prob in zip(misses.items(), fresh):
+            if prob is None:
+                continue
+            for i in idxs:
+                probs[i] = prob
+            _prediction_cache[key] = prob
+        while len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+            _prediction_cache.popitem(last=False)
+    
+    # Failed batches return default predictions (neutral)
+    probs_np = np.array([0.5 if p is None else p for p in probs], dtype=np.float64)
+    labels = (probs_np >= threshold).astype(np.int8)
+    labels[[p is None for p in probs]] = 0
+    return list(zip(probs_np.tolist(), labels.tolist()))
 
 
 @app.post("/analyze")
 async def analyze(text: str = Form(...)):
     # Validate input
     if not text or not text.strip():
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": "Text input is required and cannot be empty"},
             status_code=400
         )
     
     # Clean text: replace single newlines with spaces, normalize multiple spaces
-    cleaned = re.sub(r"(?<!\n)\n(?!\n)", " ", text)
-    cleaned = re.sub(r" +", " ", cleaned).strip()
+    cleaned = _NORMALIZE_RE.sub(" ", text).strip()
     
     if not cleaned:
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": "No valid text content after cleaning"},
             status_code=400
         )
     
-    # Split into sentences
-    spans = simple_sentence_split(cleaned)
-    
-    if not spans:
-        # If no sentences found, treat entire text as one segment
+    # Tiny or unpunctuated inputs are a single segment; skip the splitter and offset tokenization
+    if len(cleaned) < SHORT_TEXT_CHARS or not any(p in cleaned for p in ".!?"):
         spans = [(cleaned, 0, len(cleaned))]
-    
-    # Predict probabilities for each sentence
-    probs_labels = predict_texts_batch([t for (t, _, _) in spans])
+        probs_labels = predict_texts_batch([cleaned])
+    else:
+        # Split into sentences
+        spans = simple_sentence_split(cleaned)
+        
+        if not spans:
+            # If no sentences found, treat entire text as one segment
+            spans = [(cleaned, 0, len(cleaned))]
+        
+        # Predict probabilities for each sentence
+        probs_labels = predict_texts_batch(
+            [t for (t, _, _) in spans],
+            token_ids=pretokenize_spans(cleaned, spans),
+        )
     
     # Validate that predictions match spans
     if len(probs_labels) != len(spans):
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": "Prediction count mismatch"},
             status_code=500
         )
     
-    # Build segments with proper character count calculation
+    # Build segments and accumulate statistics in the same pass
     segments = []
+    ai_chars = 0
+    ai_count = 0
+    prob_sum = 0.0
     for (seg_text, start, end), (prob, label) in zip(spans, probs_labels):
-        # Use actual segment length from indices for accurate statistics
-        segment_length = end - start
+        is_ai = label == 1
         segments.append({
             "text": seg_text,
             "start": start,
             "end": end,
             "probability": prob,
-            "is_ai": label == 1,
+            "is_ai": is_ai,
         })
+        prob_sum += prob
+        if is_ai:
+            ai_count += 1
+            # Use actual segment length from indices for accurate statistics
+            ai_chars += end - start
     
     # Calculate statistics
     total_length = len(cleaned)
-    ai_segments = [s for s in segments if s["is_ai"]]
-    # Use actual segment lengths (end - start) for accurate percentage calculation
-    ai_chars = sum(s["end"] - s["start"] for s in ai_segments)
     ai_percentage = (ai_chars / total_length) * 100 if total_length > 0 else 0
     human_percentage = 100 - ai_percentage
-    avg_ai_prob = sum(s["probability"] for s in segments) / len(segments) if segments else 0
+    avg_ai_prob = prob_sum / len(segments) if segments else 0
     
     result = {
         "cleaned_text": cleaned,
@@ -239,11 +545,11 @@ async def analyze(text: str = Form(...)):
             "human_percentage": round(human_percentage, 2),
             "avg_ai_probability": round(avg_ai_prob * 100, 2),
             "total_segments": len(segments),
-            "ai_segments_count": len(ai_segments),
+            "ai_segments_count": ai_count,
         },
         "overall_assessment": "Likely AI-Generated" if avg_ai_prob > 0.5 else "Likely Human-Written",
     }
-    return JSONResponse(result)
+    return ORJSONResponse(result)
 
 
 @app.get("/healthz")
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+transformers = pytest.importorskip("transformers")
+
+from tokenization import slice_span_ids
+
+MODEL_ID = os.getenv("MODEL_ID", "desklib/ai-text-detector-v1.01")
+MAX_LEN = 256
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Meanwhile, researchers in Zürich published new results!",
+    "Can tokenizers handle C++ and C# alike?",
+    "Yes.",
+]
+
+
+def _metaspace_tokenizer():
+    # Unigram model behind a Metaspace pre-tokenizer, the scheme DeBERTa-v2/v3 uses, trained
+    # on the test sentences so it runs without the hub
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders, trainers, processors
+
+    tok = Tokenizer(models.Unigram())
+    tok.pre_tokenizer = pre_tokenizers.Metaspace()
+    tok.decoder = decoders.Metaspace()
+    tok.train_from_iterator(
+        SENTENCES * 10,
+        trainers.UnigramTrainer(vocab_size=120, special_tokens=["[PAD]", "[CLS]", "[SEP]", "[UNK]"], unk_token="[UNK]"),
+    )
+    tok.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        special_tokens=[("[CLS]", tok.token_to_id("[CLS]")), ("[SEP]", tok.token_to_id("[SEP]"))],
+    )
+    return transformers.DebertaV2TokenizerFast(
+        tokenizer_object=tok, cls_token="[CLS]", sep_token="[SEP]", pad_token="[PAD]", unk_token="[UNK]"
+    )
+
+
+@pytest.fixture(scope="module", params=["metaspace", "hub"])
+def tokenizer(request):
+    if request.param == "metaspace":
+        return _metaspace_tokenizer()
+    try:
+        tok = transformers.AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True)
+    except (OSError, ValueError) as e:
+        pytest.skip(f"tokenizer for {MODEL_ID} unavailable: {e}")
+    if not tok.is_fast:
+        pytest.skip("fast tokenizer required for offset mappings")
+    return tok
+
+
+def _text_and_spans(separator):
+    text = separator.join(SENTENCES)
+    spans = []
+    pos = 0
+    for sentence in SENTENCES:
+        start = text.index(sentence, pos)
+        pos = start + len(sentence)
+        spans.append((sentence, start, pos))
+    return text, spans
+
+
+@pytest.mark.parametrize("separator", [" ", "   "])
+def test_sliced_ids_match_per_sentence_tokenization(tokenizer, separator):
+    text, spans = _text_and_spans(separator)
+    sliced = slice_span_ids(tokenizer, text, spans, MAX_LEN)
+    assert sliced is not None
+    for (sentence, _, _), ids in zip(spans, sliced):
+        expected = tokenizer(sentence, truncation=True, max_length=MAX_LEN)["input_ids"]
+        assert ids == expected, sentence
+
+
+# After a newline Metaspace adds no "▁" in context, so ids may differ from tokenizing the sentence
+# alone (the prediction cache keys the two sources apart); the sentence itself must still be whole
+@pytest.mark.parametrize("separator", [" ", "   ", "\n\n"])
+def test_sliced_ids_cover_each_sentence(tokenizer, separator):
+    text, spans = _text_and_spans(separator)
+    sliced = slice_span_ids(tokenizer, text, spans, MAX_LEN)
+    assert sliced is not None
+    for (sentence, _, _), ids in zip(spans, sliced):
+        assert tokenizer.decode(ids, skip_special_tokens=True).strip() == sentence
+
+
+def test_sliced_ids_are_truncated_like_the_tokenizer(tokenizer):
+    sentence = " ".join(["word"] * 400) + "."
+    sliced = slice_span_ids(tokenizer, sentence, [(sentence, 0, len(sentence))], 32)
+    expected = tokenizer(sentence, truncation=True, max_length=32)["input_ids"]
+    assert sliced == [expected]
@@ -0,0 +1,36 @@
+"""Per-span model inputs sliced from one full-text tokenization.
+
+Kept free of model loading so it can be exercised against a tokenizer alone.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def slice_span_ids(tokenizer, text: str, spans: List[Tuple[str, int, int]], max_len: int) -> Optional[List[List[int]]]:
+    """
+    Tokenize text once and build model inputs for each (span_text, start, end) span.
+
+    A token belongs to a span when its character range overlaps it, so a Metaspace
+    "▁word" token whose offset covers the preceding space stays with its sentence. A bare
+    whitespace token ending right where the span starts is kept too, since tokenizing the
+    sentence alone emits the same prefix token. Returns None when a span yields no tokens.
+    """
+    enc = tokenizer(text, return_offsets_mapping=True, add_special_tokens=False, truncation=False)
+    ids = enc["input_ids"]
+    offsets = np.asarray(enc["offset_mapping"], dtype=np.int64).reshape(-1, 2)
+    token_starts = offsets[:, 0]
+    token_ends = offsets[:, 1]
+
+    token_ids: List[List[int]] = []
+    for _, start, end in spans:
+        # First token ending at or after the span start, through the last token starting before it ends
+        tok_start = int(np.searchsorted(token_ends, start, side="left"))
+        if tok_start < len(ids) and token_ends[tok_start] == start and not text[token_starts[tok_start]:start].isspace():
+            tok_start += 1
+        tok_end = int(np.searchsorted(token_starts, end, side="left"))
+        if tok_end <= tok_start:
+            return None
+        # Leave room for the special tokens, as truncation=True would
+        token_ids.append(tokenizer.build_inputs_with_special_tokens(ids[tok_start:tok_end][:max_len - 2]))
+    return token_ids
@@ -1,4 +1,5 @@
 import os
+import logging
 import io
 from typing import Optional
 
@@ -6,10 +7,18 @@ import numpy as np
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 from PIL import Image
-import requests
+import httpx
 from paddleocr import PaddleOCR
 
 
+_LOG_LEVEL_NAME = os.getenv("LOG_LEVEL", "INFO").upper()
+# getLevelName maps known names to their numeric level and anything else to a "Level x" string
+_LOG_LEVEL = logging.getLevelName(_LOG_LEVEL_NAME)
+logging.basicConfig(level=_LOG_LEVEL if isinstance(_LOG_LEVEL, int) else logging.INFO)
+logger = logging.getLogger(__name__)
+if not isinstance(_LOG_LEVEL, int):
+    logger.warning("Unknown LOG_LEVEL %r, using INFO", _LOG_LEVEL_NAME)
+
 OCR_LANG = os.getenv("OCR_LANG", "en")
 PPOCR_HOME = os.getenv("PPOCR_HOME", "/tmp/.paddleocr")
 os.makedirs(PPOCR_HOME, exist_ok=True)
@@ -18,6 +27,7 @@ os.environ.setdefault("PPOCR_HOME", PPOCR_HOME)
 # PP-OCRv5 model configuration
 USE_PP_OCRV5 = os.getenv("USE_PP_OCRV5", "true").lower() == "true"
 ACTIVE_OCR_VERSION = "unknown"  # Will be set during OCR initialization
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
 
 
 def load_ocr():
@@ -42,7 +52,7 @@ def load_ocr():
             ACTIVE_OCR_VERSION = "default"
     except Exception as e:
         # Final fallback for any initialization errors
-        print(f"PP-OCRv5 initialization failed: {e}. Falling back to default models.")
+        logger.warning("PP-OCRv5 initialization failed: %s. Falling back to default models.", e)
         ocr = PaddleOCR(use_angle_cls=True, lang=OCR_LANG, show_log=False)
         ACTIVE_OCR_VERSION = "default-fallback"
     return ocr
@@ -59,10 +69,32 @@ def read_image_from_upload(upload: UploadFile) -> Image.Image:
     return img.convert("RGB")
 
 
-def read_image_from_url(url: str) -> Image.Image:
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
-    img = Image.open(io.BytesIO(resp.content))  # type: ignore
+# Shared async client so image downloads never block the event loop (lazy initialization)
+http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(20.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            follow_redirects=True,
+            headers={"User-Agent": "TextSense-OCR/1.0"},
+        )
+    return http_client
+
+
+async def read_image_from_url(url: str) -> Image.Image:
+    buffer = bytearray()
+    async with get_http_client().stream("GET", url) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes(64 * 1024):
+            buffer += chunk
+            if len(buffer) > MAX_IMAGE_BYTES:
+                raise ValueError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+    img = Image.open(io.BytesIO(buffer))  # type: ignore
     return img.convert("RGB")
 
 
@@ -82,15 +114,15 @@ async def extract(
             if not url:
                 return JSONResponse({"error": "image_url is empty"}, status_code=400)
             try:
-                r = requests.get(url, timeout=20, headers={'User-Agent': 'TextSense-OCR/1.0'})
-                r.raise_for_status()
-                img = Image.open(io.BytesIO(r.content)).convert("RGB")  # type: ignore
-            except requests.exceptions.ConnectionError as ce:
+                img = await read_image_from_url(url)
+            except httpx.ConnectError as ce:
                 return JSONResponse({
                     "error": f"Network connection failed: {str(ce)}. The Space may have limited network access."
                 }, status_code=400)
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 return JSONResponse({"error": "Request timed out while fetching image"}, status_code=400)
+            except ValueError as ve:
+                return JSONResponse({"error": str(ve)}, status_code=413)
         else:
             return JSONResponse({"error": "No image provided. Provide 'image' file or 'image_url'."}, status_code=400)
         # Run PaddleOCR on the image
@@ -109,12 +141,18 @@ async def extract(
                     continue
         extracted = "\n".join(lines).strip()
         return JSONResponse({"text": extracted})
-    except requests.HTTPError as he:
+    except httpx.HTTPStatusError as he:
         return JSONResponse({"error": f"Failed to fetch image: {str(he)}"}, status_code=400)
     except Exception as e:
         return JSONResponse({"error": f"OCR error: {str(e)}"}, status_code=500)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if http_client is not None:
+        await http_client.aclose()
+
+
 @app.get("/healthz")
 async def healthz():
     return {"ok": True, "lang": OCR_LANG, "ocr_version": ACTIVE_OCR_VERSION}
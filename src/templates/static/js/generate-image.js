@@ -300,6 +300,28 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Prefetch the prompt enhancement once typing pauses so Generate hits a warm cache
+    let prefetchTimer = null;
+    let lastPrefetched = '';
+    function schedulePrefetch() {
+        clearTimeout(prefetchTimer);
+        prefetchTimer = setTimeout(function() {
+            const prompt = promptInput.value.trim();
+            const negativePrompt = negativePromptInput.value.trim();
+            const key = prompt + '\u0000' + negativePrompt;
+            if (!promptOptimizer.checked || prompt.length < 3 || key === lastPrefetched) {
+                return;
+            }
+            lastPrefetched = key;
+            const formData = new FormData();
+            formData.append('prompt', prompt);
+            formData.append('negative_prompt', negativePrompt);
+            fetch('/prefetch-enhancement', { method: 'POST', body: formData }).catch(function() {});
+        }, 1200);
+    }
+    promptInput.addEventListener('input', schedulePrefetch);
+    negativePromptInput.addEventListener('input', schedulePrefetch);
+
     // Add enter key support for prompt input
     promptInput.addEventListener('keydown', function(e) {
         if (e.key === 'Enter' && (e.ctrlKey || e.metaKey)) {